@@ -1,4 +1,27 @@
-# No top-level imports
+import os
+import re
+import sys
+import time
+import threading
+import subprocess
+import io
+import base64
+import struct
+import contextlib
+import concurrent.futures
+
+from lazy_imports import lazy_import, lazy_from
+from platforms import detect_platform, get_profile
+from archive import DownloadArchive, archive_id, archive_variant, youtube_video_id
+from numbering import allocate_numbers
+from extract_cache import get_cache
+from bandwidth import get_scheduler
+from metrics import get_bus
+import instrument
+
+# Heavy dependencies are only imported once a download path needs them
+YoutubeDL = lazy_from('yt_dlp', 'YoutubeDL')
+Image = lazy_import('PIL.Image')
 
 class TextStyles:
     HEADER = '\033[95m'
@@ -70,35 +93,11 @@ class Spinner:
         self.thread.join()
 
 
-def detect_platform(url):
-    platform_map = {
-        'youtube.com': 'YouTube',
-        'youtu.be': 'YouTube',
-        'facebook.com': 'Facebook',
-        'instagram.com': 'Instagram'
-    }
-    for domain, platform in platform_map.items():
-        if domain in url:
-            return platform
-    return 'Other'
-
-
 def sanitize_title(title, max_length=150):
     cleaned = re.sub(r'[\\/*?:"<>|]', '', title).strip().replace('/', '-')
     return cleaned[:max_length]
 
 
-def get_next_social_media_number(directory):
-    existing_files = [f for f in os.listdir(directory) if f.startswith('Social Media Audio')]
-    max_number = 0
-    for filename in existing_files:
-        match = re.search(r'Social Media Audio (\d+)', filename)
-        if match:
-            current_num = int(match.group(1))
-            max_number = max(max_number, current_num)
-    return max_number + 1
-
-
 def time_to_seconds(time_str):
     parts = list(map(int, time_str.split(':')))
     seconds = 0
@@ -107,67 +106,116 @@ def time_to_seconds(time_str):
     return seconds
 
 
-class ProgressLogger:
-    def __init__(self):
-        self.pbar = None
-
-    def hook(self, d):
-        if d['status'] == 'downloading':
-            if self.pbar is None:
-                self.pbar = tqdm(
-                    total=d.get('total_bytes') or d.get('downloaded_bytes'),
-                    unit='B',
-                    unit_scale=True,
-                    desc="Downloading audio"
-                )
-            self.pbar.update(d['downloaded_bytes'] - self.pbar.n)
-        elif d['status'] == 'finished':
-            if self.pbar:
-                self.pbar.close()
-
-
-def embed_cover_art_with_opusenc(input_opus, thumbnail, final_opus, title, artist, date, comment):
-    wav_file = input_opus.replace('.opus', '.wav')
-    cmd = [
-        'ffmpeg', '-hide_banner', '-loglevel', 'error',
-        '-i', input_opus,
-        '-c:a', 'pcm_s16le', '-ar', '48000',
-        wav_file
-    ]
-    subprocess.run(cmd, check=True)
-    cmd = [
-        'opusenc', '--bitrate', '192',
-        '--title', title,
-        '--artist', artist,
-        '--date', date,
-        '--comment', comment,
-        '--picture', thumbnail,
-        wav_file,
-        final_opus
+def load_cover_art(thumbnail_path):
+    """Return (jpeg_bytes, width, height) for a thumbnail, converting in memory if needed."""
+    with Image.open(thumbnail_path) as img:
+        width, height = img.size
+        if img.format == 'JPEG':
+            with open(thumbnail_path, 'rb') as f:
+                return f.read(), width, height
+        buffer = io.BytesIO()
+        img.convert('RGB').save(buffer, 'JPEG')
+        return buffer.getvalue(), width, height
+
+
+def build_picture_block(image_data, width, height, mime='image/jpeg', description='Cover'):
+    """Build a base64 FLAC picture block, the cover art format Opus/Vorbis comments use."""
+    mime_bytes = mime.encode('ascii')
+    description_bytes = description.encode('utf-8')
+    block = b''.join([
+        struct.pack('>II', 3, len(mime_bytes)), mime_bytes,  # 3 = front cover
+        struct.pack('>I', len(description_bytes)), description_bytes,
+        struct.pack('>IIIII', width, height, 24, 0, len(image_data)), image_data,
+    ])
+    return base64.b64encode(block).decode('ascii')
+
+
+def escape_ffmetadata(value):
+    for char in ('\\', '=', ';', '#', '\n'):
+        value = value.replace(char, '\\' + char)
+    return value
+
+
+def write_opus_with_metadata(input_audio, final_audio, tags, thumbnail=None, start_seconds=0, duration=None):
+    """Trim, tag and embed cover art in a single stream-copy ffmpeg pass.
+
+    Tags and the picture block are streamed to ffmpeg as an ffmetadata document on
+    stdin, so nothing is decoded, re-encoded or written to disk besides the final file.
+    """
+    metadata = [';FFMETADATA1']
+    metadata += [f"{key}={escape_ffmetadata(str(value))}" for key, value in tags.items() if value]
+    if thumbnail:
+        with instrument.stage('cover_art'):
+            picture = build_picture_block(*load_cover_art(thumbnail))
+        metadata.append(f"METADATA_BLOCK_PICTURE={escape_ffmetadata(picture)}")
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+    if start_seconds:
+        command += ['-ss', str(start_seconds)]
+    command += [
+        '-i', input_audio,
+        '-f', 'ffmetadata', '-i', 'pipe:0',
+        '-map', '0:a',
+        '-map_metadata', '1',
+        '-map_metadata:s:a', '1:g',
     ]
-    subprocess.run(cmd, check=True)
-    os.remove(wav_file)
-    print(TextStyles.success("WAV file deleted after opusenc encoding."))
-
-
-def handle_youtube(url, start_seconds, end_skip_seconds):
+    if duration:
+        command += ['-t', str(duration)]
+    command += ['-c', 'copy', final_audio]
+    with instrument.stage('mux') as stage:
+        stage.add_output(final_audio)
+        subprocess.run(command, input=('\n'.join(metadata) + '\n').encode('utf-8'), check=True)
+
+
+def reserve_output_path(directory, stem, ext):
+    """Create and return '<stem><ext>', or '<stem> (2)<ext>' and so on if it is taken.
+
+    The empty file claims the name, so parallel items with the same title never
+    write to the same file.
+    """
+    number = 1
+    while True:
+        name = f'{stem}{ext}' if number == 1 else f'{stem} ({number}){ext}'
+        path = os.path.join(directory, name)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            number += 1
+
+
+def find_thumbnail(directory, stem):
+    for ext in ['webp', 'jpg', 'png']:
+        temp_path = os.path.join(directory, f'{stem}.{ext}')
+        if os.path.exists(temp_path):
+            return temp_path
+    return None
+
+
+def handle_youtube(url, start_seconds, end_skip_seconds, archive=None, quiet=False, hooks=None):
+    final_audio = None
     try:
-        print(TextStyles.header("YouTube Audio Downloader"))
+        profile = get_profile(url)
+        if not quiet:
+            print(TextStyles.header("YouTube Audio Downloader"))
+        archive = archive or DownloadArchive()
+        video_id = youtube_video_id(url)
+        variant = archive_variant('audio', start_seconds, end_skip_seconds)
+        archived_path = archive.lookup('youtube', video_id, variant)
+        if archived_path:
+            print(TextStyles.success(f"Already downloaded, skipping:\n{archived_path}"))
+            return True
         output_dir = os.path.join('/storage/emulated/0/YouTube/Music/')
         os.makedirs(output_dir, exist_ok=True)
         print(TextStyles.success(f"Output directory: {output_dir}"))
-        with Spinner("Fetching video information..."):
-            ydl_opts = {
+        with instrument.stage('extract'), (contextlib.nullcontext() if quiet else Spinner("Fetching video information...")):
+            ydl_opts = dict(profile.ydl_params())
+            ydl_opts.update({
                 'quiet': True,
                 'skip_download': True,
                 'force_generic_extractor': True,
-                'user_agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                               'AppleWebKit/537.36 (KHTML, like Gecko) '
-                               'Chrome/91.0.4472.124 Safari/537.36'),
-                'cookiefile': '/storage/emulated/0/YouTube/Cookies/cookies.txt'
-            }
+            })
             with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+                info = get_cache().extract(ydl, url)
                 title = sanitize_title(info['title'])
                 duration = info['duration']
                 uploader = info.get('uploader', 'Unknown Artist')
@@ -176,240 +224,237 @@ def handle_youtube(url, start_seconds, end_skip_seconds):
         end_time = duration - end_skip_seconds
         if end_time <= start_seconds:
             raise ValueError("End time must be greater than start time")
-        audio_temp = os.path.join(output_dir, f'temp_{title}.opus')
-        progress_logger = ProgressLogger()
-        ydl_audio_opts = {
-            'format': 'bestaudio/best',
+        # Named by video ID: parallel batch items can share a title
+        temp_stem = f"temp_{video_id or info.get('id')}"
+        audio_temp = os.path.join(output_dir, f'{temp_stem}.opus')
+        ydl_audio_opts = dict(profile.ydl_params())
+        ydl_audio_opts.update({
+            'format': profile.audio_format,
             'outtmpl': audio_temp.replace('.opus', ''),
             'writethumbnail': True,
             'keepvideo': False,
-            'addmetadata': True,
             'quiet': True,
-            'progress_hooks': [progress_logger.hook],
-            'user_agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                           'AppleWebKit/537.36 (KHTML, like Gecko) '
-                           'Chrome/91.0.4472.124 Safari/537.36'),
-            'cookiefile': '/storage/emulated/0/YouTube/Cookies/cookies.txt',
+            'progress_hooks': [get_bus().hook(title), get_scheduler().progress_hook()] + list(hooks or []),
+            'postprocessor_hooks': [get_bus().postprocessor_hook],
+            'noprogress': True,
             'postprocessors': [
                 {
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': 'opus',
                     'preferredquality': '192',
                 },
-                {'key': 'FFmpegMetadata'}
             ],
-        }
-        with YoutubeDL(ydl_audio_opts) as ydl:
+        })
+        with instrument.stage('download') as stage, YoutubeDL(ydl_audio_opts) as ydl:
+            stage.add_output(audio_temp)
             print(TextStyles.progress("Downloading audio..."))
-            ydl.download([url])
-        thumbnail_ext = ['webp', 'jpg', 'png']
-        thumbnail_path = None
-        for ext in thumbnail_ext:
-            temp_path = os.path.join(output_dir, f'temp_{title}.{ext}')
-            if os.path.exists(temp_path):
-                thumbnail_path = temp_path
-                break
-        if thumbnail_path:
-            ext = os.path.splitext(thumbnail_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                thumbnail_final = thumbnail_path
-            else:
-                thumbnail_final = os.path.join(output_dir, f'{title}.jpg')
-                with Image.open(thumbnail_path) as img:
-                    img.convert('RGB').save(thumbnail_final, 'JPEG')
+            get_cache().download(ydl, url)
+        thumbnail_path = find_thumbnail(output_dir, temp_stem)
+        print(TextStyles.progress("Trimming audio and adding metadata..."))
+        final_audio = reserve_output_path(output_dir, title, '.opus')
+        write_opus_with_metadata(
+            audio_temp, final_audio,
+            {'title': title, 'artist': uploader, 'date': year, 'comment': f"Source={url}"},
+            thumbnail=thumbnail_path,
+            start_seconds=start_seconds,
+            duration=end_time - start_seconds
+        )
+        with instrument.stage('cleanup'):
+            if os.path.exists(audio_temp):
+                os.remove(audio_temp)
+                print(TextStyles.success("Temporary audio file deleted."))
+            if thumbnail_path and os.path.exists(thumbnail_path):
                 os.remove(thumbnail_path)
-                print(TextStyles.success("Temporary thumbnail file converted and deleted."))
-        else:
-            thumbnail_final = None
-        print(TextStyles.progress("Trimming audio..."))
-        trimmed_audio = os.path.join(output_dir, f'trimmed_{title}.opus')
-        trim_command = [
-            'ffmpeg',
-            '-hide_banner',
-            '-loglevel', 'error',
-            '-ss', str(start_seconds),
-            '-i', audio_temp,
-            '-t', str(end_time - start_seconds),
-            '-c', 'copy',
-            trimmed_audio
-        ]
-        subprocess.run(trim_command, check=True)
-        print(TextStyles.progress("Adding metadata..."))
-        final_audio = os.path.join(output_dir, f'{title}.opus')
-        if thumbnail_final:
-            embed_cover_art_with_opusenc(trimmed_audio, thumbnail_final, final_audio,
-                                         title, uploader, year, f"Source={url}")
-        else:
-            ffmpeg_command = [
-                'ffmpeg',
-                '-hide_banner',
-                '-loglevel', 'error',
-                '-i', trimmed_audio,
-                '-c', 'copy',
-                '-metadata', f'title={title}',
-                '-metadata', f'artist={uploader}',
-                '-metadata', f'date={year}',
-                '-metadata', f'comment=Source={url}',
-                final_audio
-            ]
-            subprocess.run(ffmpeg_command, check=True)
-        if os.path.exists(audio_temp):
-            os.remove(audio_temp)
-            print(TextStyles.success("Temporary audio file deleted."))
-        if os.path.exists(trimmed_audio):
-            os.remove(trimmed_audio)
-            print(TextStyles.success("Trimmed audio file deleted."))
-        if thumbnail_final and os.path.exists(thumbnail_final):
-            os.remove(thumbnail_final)
-            print(TextStyles.success("Thumbnail file deleted."))
+                print(TextStyles.success("Thumbnail file deleted."))
+        with instrument.stage('archive'):
+            archive.record('youtube', video_id or info.get('id'), final_audio, variant)
         print(TextStyles.success(f"Successfully downloaded:\n{final_audio}"))
+        return True
     except Exception as e:
-        print(TextStyles.fail(f"Error: {str(e)}"))
-        exit(1)
+        get_bus().record_failure('item')
+        print(TextStyles.fail(f"Error ({url}): {str(e)}"))
+        # Release the reserved name if nothing was written to it
+        if final_audio and os.path.exists(final_audio) and not os.path.getsize(final_audio):
+            os.remove(final_audio)
+        return False
 
 
-def handle_social_media(url, platform):
+def handle_social_media(url, platform, archive=None, quiet=False, hooks=None):
     try:
+        profile = get_profile(url)
+        archive = archive or DownloadArchive()
         base_dir = os.path.join('/storage/emulated/0/Music/SocialMedia/')
         os.makedirs(base_dir, exist_ok=True)
-        next_num = get_next_social_media_number(base_dir)
+        next_num = allocate_numbers(base_dir, 'Social Media Audio')
         final_file = os.path.join(base_dir, f'Social Media Audio {next_num}.opus')
-        with Spinner(f"{TextStyles.progress('Fetching webpage...')}"):
-            ydl_opts = {
+        with instrument.stage('extract'), (contextlib.nullcontext() if quiet else Spinner(f"{TextStyles.progress('Fetching webpage...')}")):
+            ydl_opts = dict(profile.ydl_params())
+            ydl_opts.update({
                 'quiet': True,
                 'extract_flat': True,
                 'force_generic_extractor': True,
-                'headers': {
-                    'User-Agent': ('Mozilla/5.0 (Linux; Android 10; SM-G975F) '
-                                   'AppleWebKit/537.36 (KHTML, like Gecko) '
-                                   'Chrome/118.0.5993.169 Mobile Safari/537.36'),
-                    'Referer': 'https://www.instagram.com/' if platform == 'Instagram' else 'https://www.google.com/'
-                },
-                'cookiefile': '/storage/emulated/0/YouTube/Cookies/instagram_cookies.txt' if platform == 'Instagram' else '/storage/emulated/0/YouTube/Cookies/cookies.txt'
-            }
+            })
             with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+                info = get_cache().extract(ydl, url)
                 title = sanitize_title(info.get('title', 'Unknown Title'), max_length=50)
                 uploader = sanitize_title(info.get('uploader', platform), max_length=20)
                 upload_date = info.get('upload_date', '')
                 year = upload_date[:4] if upload_date else ''
+                extractor = info.get('extractor_key') or platform
+                video_id = archive_id(extractor, info.get('id'), url)
+        archived_path = archive.lookup(extractor, video_id, 'audio')
+        if archived_path:
+            print(TextStyles.success(f"Already downloaded, skipping:\n{archived_path}"))
+            return True
         print(TextStyles.progress("Fetching audio stream..."))
         temp_audio = os.path.join(base_dir, f'temp_{next_num}.opus')
-        ydl_audio_opts = {
-            'format': 'bestaudio/best',
+        ydl_audio_opts = dict(profile.ydl_params())
+        ydl_audio_opts.update({
+            'format': profile.audio_format,
             'outtmpl': temp_audio.replace('.opus', ''),
             'quiet': True,
             'writethumbnail': True,
             'keepvideo': False,
-            'addmetadata': True,
-            'cookiefile': '/storage/emulated/0/YouTube/Cookies/instagram_cookies.txt' if platform == 'Instagram' else '/storage/emulated/0/YouTube/Cookies/cookies.txt',
+            'progress_hooks': [get_bus().hook(title), get_scheduler().progress_hook()] + list(hooks or []),
+            'postprocessor_hooks': [get_bus().postprocessor_hook],
+            'noprogress': True,
             'postprocessors': [
                 {
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': 'opus',
                     'preferredquality': '192',
                 },
-                {'key': 'FFmpegMetadata'}
             ],
-        }
-        with Spinner("Downloading audio..."):
-            with YoutubeDL(ydl_audio_opts) as ydl:
-                ydl.download([url])
-        thumbnail_ext = ['webp', 'jpg', 'png']
-        thumbnail_path = None
-        for ext in thumbnail_ext:
-            temp_path = os.path.join(base_dir, f'temp_{next_num}.{ext}')
-            if os.path.exists(temp_path):
-                thumbnail_path = temp_path
-                break
-        if thumbnail_path:
-            ext = os.path.splitext(thumbnail_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                thumbnail_final = thumbnail_path
-            else:
-                thumbnail_final = os.path.join(base_dir, f'thumb_{next_num}.jpg')
-                with Image.open(thumbnail_path) as img:
-                    img.convert('RGB').save(thumbnail_final, 'JPEG')
+        })
+        with instrument.stage('download') as stage, YoutubeDL(ydl_audio_opts) as ydl:
+            stage.add_output(temp_audio)
+            get_cache().download(ydl, url)
+        thumbnail_path = find_thumbnail(base_dir, f'temp_{next_num}')
+        print(TextStyles.progress("Adding metadata..."))
+        write_opus_with_metadata(
+            temp_audio, final_file,
+            {'title': title, 'artist': uploader, 'date': year, 'comment': f"Source={url}"},
+            thumbnail=thumbnail_path
+        )
+        with instrument.stage('cleanup'):
+            if os.path.exists(temp_audio):
+                os.remove(temp_audio)
+                print(TextStyles.success("Temporary audio file deleted."))
+            if thumbnail_path and os.path.exists(thumbnail_path):
                 os.remove(thumbnail_path)
-                print(TextStyles.success("Temporary thumbnail file converted and deleted."))
-        else:
-            thumbnail_final = None
-        print(TextStyles.progress("Converting to Opus..."))
-        if thumbnail_final:
-            embed_cover_art_with_opusenc(temp_audio, thumbnail_final, final_file,
-                                         title, uploader, year, f"Source={url}")
-        else:
-            ffmpeg_command = [
-                'ffmpeg',
-                '-hide_banner',
-                '-loglevel', 'error',
-                '-i', temp_audio,
-                '-c', 'copy',
-                '-metadata', f'title={title}',
-                '-metadata', f'artist={uploader}',
-                '-metadata', f'date={year}',
-                '-metadata', f'comment=Source={url}',
-                final_file
-            ]
-            subprocess.run(ffmpeg_command, check=True)
-        if os.path.exists(temp_audio):
-            os.remove(temp_audio)
-            print(TextStyles.success("Temporary audio file deleted."))
-        if thumbnail_final and os.path.exists(thumbnail_final):
-            os.remove(thumbnail_final)
-            print(TextStyles.success("Thumbnail file deleted."))
+                print(TextStyles.success("Thumbnail file deleted."))
+        with instrument.stage('archive'):
+            archive.record(extractor, video_id, final_file, 'audio')
         print(TextStyles.success(f"Successfully downloaded:\n{final_file}"))
+        return True
     except Exception as e:
-        print(TextStyles.fail(f"Error: {str(e)}"))
-        exit(1)
+        get_bus().record_failure('item')
+        print(TextStyles.fail(f"Error ({url}): {str(e)}"))
+        return False
+
+
+def process_url(url, start_seconds, end_skip_seconds, archive=None, quiet=False, hooks=None):
+    platform = detect_platform(url)
+    with instrument.job(url):
+        if platform == 'YouTube':
+            return handle_youtube(url, start_seconds, end_skip_seconds, archive, quiet, hooks)
+        elif platform in ['Facebook', 'Instagram']:
+            return handle_social_media(url, platform, archive, quiet, hooks)
+    print(TextStyles.fail(f"Unsupported platform: {url}"))
+    return False
+
+
+def read_url_list(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def expand_playlist(url):
+    ydl_opts = dict(get_profile(url).ydl_params())
+    ydl_opts.update({
+        'quiet': True,
+        'extract_flat': True,
+    })
+    with Spinner("Fetching playlist..."):
+        with YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    return [entry.get('url') or f"https://www.youtube.com/watch?v={entry['id']}"
+            for entry in info.get('entries') or [] if entry]
+
+
+def run_batch(urls, start_seconds, end_skip_seconds, workers):
+    """Process many URLs concurrently; a failing item never stops the others."""
+    archive = DownloadArchive()
+    print(TextStyles.section(f"Batch: {len(urls)} items with {workers} workers"))
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_url, url, start_seconds, end_skip_seconds, archive, True): url
+            for url in urls
+        }
+        for future in concurrent.futures.as_completed(futures):
+            url = futures[future]
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                print(TextStyles.fail(f"Error ({url}): {str(e)}"))
+                results[url] = False
+    failed = [url for url in urls if not results.get(url)]
+    print(TextStyles.success(f"Successfully processed {len(urls) - len(failed)}/{len(urls)} items"))
+    for url in failed:
+        print(TextStyles.fail(f"Failed: {url}"))
+    summary = instrument.batch_summary()
+    if summary:
+        print(TextStyles.section("Stage Timing"))
+        print(summary)
+    return not failed
 
 
 def main():
     # Prompt for URL and detect platform early for faster load
-    url = input(TextStyles.input_prompt("Enter URL (YouTube/Facebook/Instagram): ")).strip()
+    url = input(TextStyles.input_prompt("Enter URL, playlist URL or URL list file (YouTube/Facebook/Instagram): ")).strip()
     if not url:
         print(TextStyles.fail("Invalid URL"))
         return
-    platform = detect_platform(url)
+    url_file = os.path.expanduser(url)
+    batch_file = os.path.isfile(url_file)
+    platform = 'Batch' if batch_file else detect_platform(url)
+    playlist = platform == 'YouTube' and 'list=' in url
+    batch = batch_file or playlist
     print(TextStyles.success(f"Detected platform: {platform}"))
-    
+
     # If YouTube, also prompt for start and end times
-    if platform == 'YouTube':
+    start_seconds = end_skip_seconds = 0
+    if platform in ['YouTube', 'Batch']:
         print(TextStyles.header("YouTube Audio Downloader"))
         start_time = input(TextStyles.input_prompt("Start time [M:SS or SS] (Enter for 0): ")).strip() or '0'
         end_skip = input(TextStyles.input_prompt("Seconds to skip from end [M:SS or SS] (Enter for 0): ")).strip() or '0'
         start_seconds = time_to_seconds(start_time)
         end_skip_seconds = time_to_seconds(end_skip)
-    
-    # Now import heavy libraries
-    import os
-    import re
-    import sys
-    import time
-    import threading
-    import subprocess
-    from tqdm import tqdm
-    from PIL import Image
-    from yt_dlp import YoutubeDL
-
-    globals()['os'] = os
-    globals()['re'] = re
-    globals()['sys'] = sys
-    globals()['time'] = time
-    globals()['threading'] = threading
-    globals()['subprocess'] = subprocess
-    globals()['tqdm'] = tqdm
-    globals()['Image'] = Image
-    globals()['YoutubeDL'] = YoutubeDL
-
-    if platform == 'YouTube':
-        handle_youtube(url, start_seconds, end_skip_seconds)
-    elif platform in ['Facebook', 'Instagram']:
-        handle_social_media(url, platform)
-    else:
+    if batch:
+        default_workers = os.cpu_count() or 2
+        workers = input(TextStyles.input_prompt(f"Parallel workers (Enter for {default_workers}): ")).strip()
+        workers = max(1, int(workers)) if workers.isdigit() else default_workers
+
+    if not batch and platform not in ['YouTube', 'Facebook', 'Instagram']:
         print(TextStyles.fail("Unsupported platform"))
         return
 
+    bus = get_bus()
+    bus.start()
+    try:
+        if batch:
+            urls = read_url_list(url_file) if batch_file else expand_playlist(url)
+            if not urls:
+                print(TextStyles.fail("No URLs found"))
+                sys.exit(1)
+            if not run_batch(urls, start_seconds, end_skip_seconds, workers):
+                sys.exit(1)
+        elif not process_url(url, start_seconds, end_skip_seconds):
+            sys.exit(1)
+    finally:
+        bus.close()
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -3,7 +3,20 @@ import time
 import os
 import sys
 import threading
+import argparse
+import copy
+import json
+import queue
+import ctypes
+import ctypes.util
+import struct
 from pathlib import Path
+from platforms import get_profile, is_supported
+from bandwidth import get_scheduler
+from metrics import get_bus
+from lazy_imports import lazy_from
+
+YoutubeDL = lazy_from('yt_dlp', 'YoutubeDL')
 
 class TextStyles:
     HEADER = '\033[95m'
@@ -74,27 +87,24 @@ class Spinner:
 
 # CONFIGURATION
 DOWNLOAD_DIR = str(Path.home() / "storage/shared/Movies")
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+QUEUE_FILE = os.path.join(DOWNLOAD_DIR, ".pending_downloads.json")
 
-def check_environment():
+def check_environment(require_termux=True):
     """Verify all requirements are installed"""
     spinner = Spinner("Checking environment...")
     spinner.start()
     
     try:
         # Basic environment check
-        if not os.path.exists("/data/data/com.termux/files/home"):
+        if require_termux and not os.path.exists("/data/data/com.termux/files/home"):
             spinner.stop()
             print(TextStyles.fail("Please run this in Termux environment"))
             return False
 
-        # Show yt-dlp version
-        version = subprocess.run(["yt-dlp", "--version"], 
-                               check=True, 
-                               capture_output=True, 
-                               text=True)
+        # Import yt-dlp once up front; the engine reuses it for every link
+        from yt_dlp.version import __version__ as yt_dlp_version
         spinner.stop()
-        print(TextStyles.success(f"Using yt-dlp version {version.stdout.strip()}"))
+        print(TextStyles.success(f"Using yt-dlp version {yt_dlp_version}"))
 
         # Verify download directory
         Path(DOWNLOAD_DIR).mkdir(parents=True, exist_ok=True)
@@ -102,7 +112,7 @@ def check_environment():
 
         return True
 
-    except subprocess.CalledProcessError:
+    except ImportError:
         spinner.stop()
         print(TextStyles.fail("Please install yt-dlp: pip install yt-dlp"))
         return False
@@ -122,30 +132,288 @@ def get_clipboard_content():
     except Exception:
         return ""
 
+class ClipboardWatcher:
+    """Base class for clipboard sources; watch() yields each new piece of text"""
+    def watch(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class PollingWatcher(ClipboardWatcher):
+    """Poll termux-clipboard-get, backing off while the clipboard stays unchanged"""
+    def __init__(self, min_interval=0.5, max_interval=10.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+    def watch(self):
+        last_content = None
+        interval = self.min_interval
+        while True:
+            content = get_clipboard_content()
+            if content and content != last_content:
+                last_content = content
+                interval = self.min_interval
+                yield content
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+            time.sleep(interval)
+
+class StreamWatcher(ClipboardWatcher):
+    """Long-lived reader: one link per line from stdin or a command's stdout"""
+    def __init__(self, command=None):
+        self.process = None
+        if command:
+            self.process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, text=True)
+            self.stream = self.process.stdout
+        else:
+            self.stream = sys.stdin
+
+    def watch(self):
+        for line in self.stream:
+            if line.strip():
+                yield line.strip()
+
+    def close(self):
+        if self.process:
+            self.process.terminate()
+
+class FifoWatcher(ClipboardWatcher):
+    """Drop-box FIFO: `echo URL > path` delivers a link with no polling at all"""
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        # Opening read-write keeps a writer attached, so reads block instead of
+        # hitting EOF every time a producer closes its end
+        self.stream = os.fdopen(os.open(path, os.O_RDWR), 'r')
+
+    def watch(self):
+        for line in self.stream:
+            if line.strip():
+                yield line.strip()
+
+    def close(self):
+        self.stream.close()
+
+class FileWatcher(ClipboardWatcher):
+    """Watch a regular file via inotify and yield its content whenever it is rewritten"""
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        Path(self.path).touch(exist_ok=True)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch the directory so editors that replace the file are seen too
+        watch = libc.inotify_add_watch(self.fd, os.path.dirname(self.path).encode(),
+                                       self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if watch < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def read_file(self):
+        try:
+            with open(self.path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def watch(self):
+        name = os.path.basename(self.path).encode()
+        last_content = self.read_file()
+        while True:
+            data = os.read(self.fd, 4096)
+            offset = 0
+            changed = False
+            while offset < len(data):
+                _, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                changed |= data[offset:offset + length].rstrip(b'\0') == name
+                offset += length
+            if changed:
+                content = self.read_file()
+                if content and content != last_content:
+                    last_content = content
+                    yield content
+
+    def close(self):
+        os.close(self.fd)
+
+def create_watcher(spec):
+    """Build a watcher from 'poll', 'stdin', 'cmd:COMMAND', 'fifo:PATH' or 'file:PATH'"""
+    kind, _, arg = spec.partition(':')
+    if kind == 'poll':
+        return PollingWatcher()
+    if kind == 'stdin':
+        return StreamWatcher()
+    if kind == 'cmd' and arg:
+        return StreamWatcher(arg)
+    if kind == 'fifo' and arg:
+        return FifoWatcher(arg)
+    if kind == 'file' and arg:
+        return FileWatcher(arg)
+    raise ValueError(f"Unknown watcher: {spec}")
+
 def is_video_url(url):
     """Check if URL is from supported platforms"""
-    domains = [
-        "facebook.com", "fb.watch",
-        "instagram.com", "tiktok.com",
-        "youtube.com", "youtu.be",
-        "twitter.com", "x.com",
-        "vimeo.com", "dailymotion.com"
-    ]
-    return any(domain in url.lower() for domain in domains) if url else False
-
-def simple_download(url):
-    """Simplified download as fallback"""
-    try:
-        subprocess.run([
-            "yt-dlp",
-            "-f", "best",
-            "--user-agent", USER_AGENT,
-            "-o", f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
-            url
-        ], check=True)
-        return True
-    except Exception:
-        return False
+    return is_supported(url) if url else False
+
+# Substrings of yt-dlp error messages, checked in order
+FAILURE_PATTERNS = [
+    # A missing ffmpeg is a setup problem that no retry fixes, whatever stage reports it
+    ('other', ('ffmpeg not found', 'ffprobe not found')),
+    ('format', ('requested format is not available', 'format is not available', 'no video formats')),
+    ('forbidden', ('http error 403', 'forbidden')),
+    ('merge', ('postprocessing', 'merging', 'merger', 'conversion failed')),
+    ('network', ('timed out', 'timeout', 'connection', 'temporary failure', 'network is unreachable',
+                 'incompleteread', 'http error 5', 'remote end closed', 'unable to download')),
+]
+
+def classify_failure(message):
+    """Map a yt-dlp error message to format, forbidden, merge, network or other"""
+    message = message.lower()
+    for kind, patterns in FAILURE_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return kind
+    return 'other'
+
+class YtdlLogger:
+    """Route yt-dlp messages through TextStyles instead of its raw stdout"""
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        print(TextStyles.warning(msg))
+
+    def error(self, msg):
+        print(TextStyles.fail(msg))
+
+class DownloadEngine:
+    """Keep warm, reusable YoutubeDL instances in-process instead of spawning yt-dlp
+
+    Instances are cached per platform profile (see platforms.py) and per worker
+    thread, since a YoutubeDL object must not be shared by concurrent downloads.
+    """
+    MAX_ATTEMPTS = 5
+    BACKOFF_BASE = 2
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def base_params(self):
+        return {
+            'outtmpl': f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
+            'logger': YtdlLogger(),
+            'noprogress': True,
+            'progress_hooks': [get_bus().hook(), get_scheduler().progress_hook()],
+            'postprocessor_hooks': [get_bus().postprocessor_hook],
+        }
+
+    def make_ydl(self, profile, **overrides):
+        params = self.base_params()
+        # The clipboard downloader never sent the scripts' cookie files
+        params.update(profile.ydl_params(cookies=False))
+        params['format'] = profile.video_format
+        params.update(overrides)
+        return YoutubeDL(params)
+
+    def get_ydl(self, profile):
+        instances = self.local.__dict__.setdefault('instances', {})
+        if profile.name not in instances:
+            instances[profile.name] = self.make_ydl(profile)
+        return instances[profile.name]
+
+    def extract(self, url, profile):
+        """Extract without format selection so the raw format list stays available"""
+        return self.get_ydl(profile).extract_info(url, download=False, process=False)
+
+    def next_format(self, info, tried, ydl):
+        """Best not-yet-tried format of the extracted list, ranked by `ydl`'s format sorter
+
+        An unprocessed info dict keeps the extractor's format order, so a copy of
+        the list is sorted (worst first, as yt-dlp does) before picking.
+        """
+        ranked = dict(info, formats=list(info.get('formats') or []))
+        ydl.sort_formats(ranked)
+        formats = [f for f in reversed(ranked['formats']) if f.get('format_id') not in tried]
+        for f in formats:
+            if f.get('vcodec') != 'none' and f.get('acodec') != 'none':
+                return f['format_id']
+        for f in formats:
+            if f.get('vcodec') != 'none':
+                return f"{f['format_id']}+bestaudio"
+        return None
+
+    def download(self, url, profile):
+        """Download with the warm instance of a profile, recovering only the stage that failed
+
+        A single video is extracted once. Network errors retry the same download with
+        backoff, continuing from the .part/fragment files already on disk; a 403
+        re-extracts fresh stream URLs; an unavailable format moves to the next format
+        of the extracted list; a failed merge retries only the merge into MKV, reusing
+        the already downloaded streams. Playlist entries are generators that one
+        attempt consumes, so playlists are extracted again for every attempt.
+        Returns True on success.
+        """
+        info = None
+        ydl = None
+        # Instances made for a retry belong to this call and are closed at the end;
+        # the warm per-profile instance stays open for the next download
+        retry_ydl = None
+        tried_formats = set()
+        try:
+            for attempt in range(self.MAX_ATTEMPTS):
+                try:
+                    if info is None:
+                        info = self.extract(url, profile)
+                    if ydl is None:
+                        ydl = self.get_ydl(profile)
+                    if info.get('_type', 'video') == 'video':
+                        result = copy.deepcopy(info)
+                    else:
+                        result, info = info, None
+                    ydl.process_ie_result(result, download=True)
+                    return True
+                except Exception as e:
+                    # DownloadError details were already reported through YtdlLogger
+                    failure = classify_failure(str(e))
+                if attempt == self.MAX_ATTEMPTS - 1 or failure == 'other':
+                    break
+                print(TextStyles.warning(f"Recovering from {failure} failure (attempt {attempt + 2}/{self.MAX_ATTEMPTS})"))
+                if failure == 'network':
+                    time.sleep(self.BACKOFF_BASE ** attempt)
+                elif failure == 'forbidden':
+                    time.sleep(self.BACKOFF_BASE ** attempt)
+                    info = None
+                elif failure == 'format' and info is not None:
+                    format_id = self.next_format(info, tried_formats, self.get_ydl(profile))
+                    if not format_id:
+                        break
+                    tried_formats.add(format_id.split('+')[0])
+                    print(TextStyles.progress(f"Trying format {format_id}"))
+                    ydl = retry_ydl = self.replace_ydl(retry_ydl, profile, format=format_id)
+                elif failure == 'merge':
+                    ydl = retry_ydl = self.replace_ydl(retry_ydl, profile, merge_output_format='mkv')
+            return False
+        finally:
+            if retry_ydl is not None:
+                retry_ydl.close()
+
+    def replace_ydl(self, previous, profile, **overrides):
+        """Close the previous retry instance and make a new one with `overrides`"""
+        if previous is not None:
+            previous.close()
+        return self.make_ydl(profile, **overrides)
+
+engine = DownloadEngine()
 
 def download_video(url):
     """Download video with platform-specific handling"""
@@ -156,102 +424,147 @@ def download_video(url):
     print(TextStyles.progress(f"Processing: {url}"))
 
     try:
-        # Platform-specific handling
-        if "facebook.com" in url.lower() or "fb.watch" in url.lower():
-            cmd = [
-                "yt-dlp",
-                "-f", "best",
-                "--user-agent", USER_AGENT,
-                "--referer", "https://www.facebook.com/",
-                "--no-check-certificate",
-                "--merge-output-format", "mp4",
-                "-o", f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
-                url
-            ]
-        elif "instagram.com" in url.lower():
-            cmd = [
-                "yt-dlp",
-                "-f", "best",
-                "--user-agent", USER_AGENT,
-                "--cookies-from-browser", "firefox",
-                "-o", f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
-                url
-            ]
-        elif "tiktok.com" in url.lower():
-            cmd = [
-                "yt-dlp",
-                "-f", "best",
-                "--user-agent", USER_AGENT,
-                "--referer", "https://www.tiktok.com/",
-                "-o", f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
-                url
-            ]
-        else:  # Default (YouTube etc)
-            cmd = [
-                "yt-dlp",
-                "-f", "bestvideo[height<=1080]+bestaudio/best[height<=1080]",
-                "--user-agent", USER_AGENT,
-                "-o", f"{DOWNLOAD_DIR}/%(title)s.%(ext)s",
-                url
-            ]
-
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True
-        )
-
-        for line in process.stdout:
-            if '[download]' in line:
-                print(TextStyles.download(line.strip()))
-            elif 'ERROR' in line:
-                print(TextStyles.fail(line.strip()))
-            else:
-                print(line.strip())
-
-        process.wait()
-        
-        if process.returncode == 0:
+        if engine.download(url, get_profile(url)):
             print(TextStyles.success("\n🎉 Download completed successfully!"))
             return True
         else:
-            print(TextStyles.warning("\n⚠️ Trying alternative method..."))
-            # Fallback to generic download
-            return simple_download(url)
+            get_bus().record_failure('item')
+            print(TextStyles.fail("\n❌ Download failed after all recovery attempts"))
+            return False
 
     except Exception as e:
         print(TextStyles.fail(f"\n❌ Download error: {str(e)}"))
         return False
 
+class DownloadQueue:
+    """Queue links for background workers, skipping links already queued or downloaded
+
+    Pending links are written to QUEUE_FILE on every change so a restart picks up
+    whatever was still waiting or downloading. A failed link is queued again after
+    a growing delay, since the clipboard watcher only reports a link once while it
+    stays copied.
+    """
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 30
+
+    def __init__(self, workers=2, path=QUEUE_FILE):
+        self.workers = workers
+        self.path = path
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.pending = []
+        self.attempts = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return [url for url in json.load(f) if isinstance(url, str)]
+        except (OSError, ValueError):
+            return []
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.pending, f)
+        os.replace(temp_path, self.path)
+
+    def add(self, url):
+        """Queue a link; returns False if it is already queued or was downloaded"""
+        with self.lock:
+            if url in self.seen:
+                return False
+            self.seen.add(url)
+            self.pending.append(url)
+            self.save()
+        self.queue.put(url)
+        return True
+
+    def worker(self):
+        while True:
+            url = self.queue.get()
+            try:
+                success = download_video(url)
+            except Exception as e:
+                print(TextStyles.fail(f"Download error: {str(e)}"))
+                success = False
+            with self.lock:
+                attempt = self.attempts.get(url, 0) + 1
+                retry = not success and attempt < self.MAX_ATTEMPTS
+                if retry:
+                    # Stays pending (and saved) until the retry runs
+                    self.attempts[url] = attempt
+                else:
+                    self.attempts.pop(url, None)
+                    self.pending.remove(url)
+                    if not success:
+                        # Allow the same link to be queued again once it is copied anew
+                        self.seen.discard(url)
+                    self.save()
+            if success:
+                print(TextStyles.success(f"Done: {url}"))
+            elif retry:
+                delay = self.RETRY_DELAY * 2 ** (attempt - 1)
+                print(TextStyles.warning(f"Failed, retrying in {delay}s "
+                                         f"(attempt {attempt + 1}/{self.MAX_ATTEMPTS}): {url}"))
+                timer = threading.Timer(delay, self.queue.put, (url,))
+                timer.daemon = True
+                timer.start()
+            else:
+                print(TextStyles.fail(f"Failed after {attempt} attempts, giving up: {url}"))
+            self.queue.task_done()
+
+    def start(self):
+        restored = self.load()
+        for url in restored:
+            self.add(url)
+        if restored:
+            print(TextStyles.progress(f"Restored {len(restored)} pending downloads"))
+        for _ in range(self.workers):
+            threading.Thread(target=self.worker, daemon=True).start()
+
 def main():
+    parser = argparse.ArgumentParser(description="Download video links as they are copied")
+    parser.add_argument("--watch", default="poll",
+                        help="link source: poll (Termux clipboard, default), stdin, "
+                             "cmd:COMMAND, fifo:PATH or file:PATH")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="number of simultaneous downloads (default: 2)")
+    args = parser.parse_args()
+
     print(TextStyles.header("Social Media Video Downloader"))
     print(TextStyles.progress("Monitoring clipboard for video links..."))
     
-    if not check_environment():
+    if not check_environment(require_termux=args.watch == 'poll'):
         print(TextStyles.fail("Exiting due to setup issues"))
         sys.exit(1)
 
-    last_downloaded = ""
     try:
-        while True:
-            clipboard_content = get_clipboard_content()
-            
-            if clipboard_content and clipboard_content != last_downloaded and is_video_url(clipboard_content):
+        watcher = create_watcher(args.watch)
+    except (ValueError, OSError) as e:
+        print(TextStyles.fail(f"Cannot start watcher: {str(e)}"))
+        sys.exit(1)
+
+    download_queue = DownloadQueue(workers=max(1, args.workers))
+    download_queue.start()
+    bus = get_bus()
+    bus.start()
+    try:
+        for clipboard_content in watcher.watch():
+            if is_video_url(clipboard_content) and download_queue.add(clipboard_content):
                 print(TextStyles.section("New Video Found"))
-                print(TextStyles.progress(f"URL: {clipboard_content}"))
-                if download_video(clipboard_content):
-                    last_downloaded = clipboard_content
-                    print(TextStyles.success("Ready for next download"))
-                else:
-                    print(TextStyles.warning("Will try again with next link"))
-            
-            time.sleep(3)
+                print(TextStyles.progress(f"Queued: {clipboard_content} "
+                                          f"({download_queue.queue.qsize()} waiting)"))
             
     except KeyboardInterrupt:
         print(TextStyles.header("Thank you for using Social Media Video Downloader!"))
+        if download_queue.pending:
+            print(TextStyles.progress(f"{len(download_queue.pending)} pending downloads will resume on next start"))
     except Exception as e:
         print(TextStyles.fail(f"Unexpected error: {str(e)}"))
+    finally:
+        watcher.close()
+        bus.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,32 @@
+import asyncio
+import csv
+import hashlib
+import json
 import os
 import re
+import time
+from html import escape
+from urllib.parse import quote
+
+from lazy_imports import lazy_import, lazy_from
+
+# Heavy dependencies are only imported once the chosen path needs them;
+# WeasyPrint in particular is never loaded unless a PDF is written.
+requests = lazy_import("requests")
+yt_dlp = lazy_import("yt_dlp")
+HTML = lazy_from("weasyprint", "HTML")
 
 # Configuration
 API_KEY_FILE = os.path.expanduser("~/.youtube_api_key")
+SNAPSHOT_DIR = os.path.expanduser("~/.youtube_channel_snapshots")
 OUTPUT_DIR = "/storage/emulated/0/YouTube/INFO/"
 FONT_PATH = "/storage/emulated/0/YouTube/Cookies/NotoSansBengali-Regular.ttf"
+API_BASE_URL = "https://www.googleapis.com/youtube/v3/"
+MAX_RETRIES = 5
+RETRY_REASONS = {'quotaExceeded', 'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+VIDEOS_BATCH_SIZE = 50  # videos.list accepts at most 50 IDs per call
+MAX_CONCURRENT_REQUESTS = 8
+PDF_CHUNK_SIZE = 2000  # videos per PDF part
 
 def get_api_key():
     """Get API key from storage or prompt user once."""
@@ -25,52 +47,199 @@ def sanitize_filename(title):
     """Sanitize the title to make it a valid filename."""
     return re.sub(r'[\\/*?:"<>|]', '_', title).strip()
 
-# Functions that depend on heavy libraries (requests, weasyprint, yt_dlp)
-# Their definitions remain unchanged; we assume these modules will be imported later.
+def load_snapshot(channel_url):
+    """Load the stored snapshot (channel ID, ETag cache, video list) of a previous run."""
+    path = snapshot_path(channel_url)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {'channel_id': None, 'etags': {}, 'videos': []}
+
+def save_snapshot(channel_url, snapshot):
+    """Atomically write the snapshot used by the next incremental run."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(channel_url)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+def snapshot_path(channel_url):
+    channel_url = channel_url.rstrip("/")
+    if channel_url.endswith("/videos"):
+        channel_url = channel_url[:-len("/videos")]
+    return os.path.join(SNAPSHOT_DIR, hashlib.sha1(channel_url.encode('utf-8')).hexdigest() + '.json')
+
+def format_duration(iso_duration):
+    """Convert an ISO 8601 duration such as PT1H2M3S to H:MM:SS."""
+    match = re.match(r'P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', iso_duration or '')
+    if not match:
+        return ''
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    hours += days * 24
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def create_session(pool_size=10):
+    """Create a pooled HTTP session shared by every API call of a run."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+def should_retry(response):
+    """Retry on 5xx and on quota/rate-limit errors, which the API reports as 403/429."""
+    if response.status_code >= 500 or response.status_code == 429:
+        return True
+    if response.status_code == 403:
+        try:
+            errors = response.json().get('error', {}).get('errors', [])
+        except ValueError:
+            return False
+        return any(error.get('reason') in RETRY_REASONS for error in errors)
+    return False
+
+class EtagStore:
+    """ETag cache of one run: answers from the previous run's entries, keeps only those used now."""
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.used = {}
+
+    def get(self, key):
+        return self.used.get(key) or self.previous.get(key)
+
+    def __setitem__(self, key, value):
+        self.used[key] = value
 
-def get_channel_info(api_key, channel_id):
+def api_get(session, api_key, endpoint, store=None, **params):
+    """
+    GET a Data API endpoint with exponential backoff and return the JSON body.
+    With a snapshot `store`, the request is conditional on the ETag of the last
+    response; a 304 answer reuses the stored body instead of transferring it again.
+    """
+    cache_key = endpoint + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+    cached = store.get(cache_key) if store is not None else None
+    headers = {'If-None-Match': cached['etag']} if cached else {}
+    params['key'] = api_key
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = session.get(API_BASE_URL + endpoint, params=params, headers=headers, timeout=30)
+        except requests.RequestException:
+            if attempt == MAX_RETRIES - 1:
+                raise
+        else:
+            if response.status_code == 304 and cached:
+                store[cache_key] = cached
+                return cached['body']
+            if not should_retry(response) or attempt == MAX_RETRIES - 1:
+                body = response.json()
+                if store is not None and response.ok and body.get('etag'):
+                    store[cache_key] = {'etag': body['etag'], 'body': body}
+                return body
+        time.sleep(2 ** attempt)
+    return {}
+
+def get_channel_info(session, api_key, channel_id, store=None):
     """Get channel title using channel ID."""
-    url = f"https://www.googleapis.com/youtube/v3/channels?part=snippet&id={channel_id}&key={api_key}"
-    response = requests.get(url).json()
+    response = api_get(session, api_key, "channels", store, part="snippet", id=channel_id)
     if response.get('items'):
         return response['items'][0]['snippet']['title']
     return "Unknown_Channel"
 
-def get_channel_id(api_key, url):
+def get_channel_id(session, api_key, url):
     """Extract channel ID from the given URL."""
     if '/channel/' in url:
         return url.split('/channel/')[-1].split('/')[0]
     elif '/@' in url:
         handle = url.split('/@')[-1].split('/')[0]
-        search_url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&type=channel&q={handle}&key={api_key}"
-        response = requests.get(search_url).json()
+        response = api_get(session, api_key, "search", part="snippet", type="channel", q=handle)
         if response.get('items'):
             return response['items'][0]['snippet']['channelId']
     return None
 
-def get_playlists(api_key, channel_id):
+def get_playlists(session, api_key, channel_id, store=None):
     """Fetch all playlists for a given channel ID using the API."""
     playlists = []
     next_page_token = None
 
     while True:
-        url = f"https://www.googleapis.com/youtube/v3/playlists?part=snippet&channelId={channel_id}&maxResults=50&key={api_key}"
+        params = {'part': 'snippet', 'channelId': channel_id, 'maxResults': 50}
         if next_page_token:
-            url += f"&pageToken={next_page_token}"
-        
-        response = requests.get(url).json()
+            params['pageToken'] = next_page_token
+
+        response = api_get(session, api_key, "playlists", store, **params)
         playlists.extend(response.get('items', []))
         next_page_token = response.get('nextPageToken')
-        if not next_page_token: 
+        if not next_page_token:
             break
 
     return playlists
 
-def get_videos_ytdlp(channel_url):
+def get_playlist_items(session, api_key, playlist_id, store=None):
+    """Fetch the video IDs of a playlist, in playlist order."""
+    video_ids = []
+    next_page_token = None
+
+    while True:
+        params = {'part': 'contentDetails', 'playlistId': playlist_id, 'maxResults': 50}
+        if next_page_token:
+            params['pageToken'] = next_page_token
+
+        response = api_get(session, api_key, "playlistItems", store, **params)
+        video_ids.extend(item['contentDetails']['videoId'] for item in response.get('items', []))
+        next_page_token = response.get('nextPageToken')
+        if not next_page_token:
+            break
+
+    return video_ids
+
+def get_video_details(session, api_key, video_ids, store=None):
+    """Fetch title, duration and view count for up to 50 videos in one videos.list call."""
+    response = api_get(session, api_key, "videos", store,
+                       part="snippet,contentDetails,statistics", id=",".join(video_ids))
+    details = {}
+    for item in response.get('items', []):
+        details[item['id']] = {
+            'id': item['id'],
+            'title': item['snippet']['title'],
+            'duration': format_duration(item['contentDetails'].get('duration')),
+            'views': int(item.get('statistics', {}).get('viewCount', 0)),
+        }
+    return details
+
+async def expand_playlists(session, api_key, playlists, store=None):
+    """
+    Attach a 'videos' list with duration and view count to every playlist.
+    Video IDs are de-duplicated across playlists and enriched 50 per videos.list
+    call, so quota cost grows with the number of distinct videos / 50.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def limited(func, *args):
+        async with semaphore:
+            return await asyncio.to_thread(func, session, api_key, *args, store)
+
+    playlist_items = await asyncio.gather(
+        *(limited(get_playlist_items, playlist['id']) for playlist in playlists))
+
+    unique_ids = list(dict.fromkeys(video_id for items in playlist_items for video_id in items))
+    batches = [unique_ids[i:i + VIDEOS_BATCH_SIZE] for i in range(0, len(unique_ids), VIDEOS_BATCH_SIZE)]
+    details = {}
+    for batch_details in await asyncio.gather(*(limited(get_video_details, batch) for batch in batches)):
+        details.update(batch_details)
+
+    for playlist, video_ids in zip(playlists, playlist_items):
+        # Private and deleted videos are listed in the playlist but not returned by videos.list
+        playlist['videos'] = [details[video_id] for video_id in video_ids if video_id in details]
+
+def get_videos_ytdlp(channel_url, previous_videos=None):
     """
     Fetch all videos from the channel using yt-dlp.
     To avoid extracting unwanted tabs (like streams), we append '/videos' if not already present.
     The options below suppress progress messages.
+    With `previous_videos` from the last snapshot, the newest-first listing is read
+    lazily and stops at the first already known video, so only new pages are fetched.
     """
     if not channel_url.rstrip("/").endswith("/videos"):
         channel_url = channel_url.rstrip("/") + "/videos"
@@ -80,15 +249,24 @@ def get_videos_ytdlp(channel_url):
         'skip_download': True,
         'quiet': True,
         'no_warnings': True,
+        'lazy_playlist': True,
     }
+    known_ids = {video['id'] for video in previous_videos or []}
+    videos = []
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(channel_url, download=False)
-        videos = info.get('entries', [])
-        return videos
+        info = ydl.extract_info(channel_url, download=False, process=False)
+        for entry in info.get('entries') or []:
+            if entry.get('id') in known_ids:
+                return videos + previous_videos
+            videos.append({
+                'id': entry.get('id'),
+                'title': entry.get('title', 'No Title'),
+                'duration': entry.get('duration'),
+                'view_count': entry.get('view_count'),
+            })
+    return videos
 
-def generate_html(channel_title, playlists, videos):
-    """Generate an HTML string with channel, playlists, and videos info, applying the custom font."""
-    css = f"""
+REPORT_CSS = f"""
     <style>
     @font-face {{
         font-family: 'NotoSansBengali';
@@ -114,13 +292,24 @@ def generate_html(channel_title, playlists, videos):
     a:hover {{
         text-decoration: underline;
     }}
+    .stats {{
+        color: #555;
+        font-size: 0.85em;
+    }}
     </style>
     """
 
-    html = f"""<html>
+def iter_html(channel_title, playlists, videos, video_start=1):
+    """
+    Yield the report HTML piece by piece with every title escaped.
+    Writing the pieces straight to a file keeps memory flat for channels with
+    tens of thousands of videos; `video_start` numbers the videos of a split part.
+    """
+    channel_title = escape(channel_title)
+    yield f"""<html>
 <head>
 <meta charset="UTF-8">
-{css}
+{REPORT_CSS}
 <title>{channel_title} Info</title>
 </head>
 <body>
@@ -128,85 +317,193 @@ def generate_html(channel_title, playlists, videos):
 """
 
     # Playlists section (using API)
-    html += "<h2>Playlists</h2>\n"
-    if playlists:
-        html += "<ol>\n"
-        for playlist in playlists:
-            title = playlist['snippet']['title']
-            playlist_id = playlist['id']
-            playlist_url = f"https://www.youtube.com/playlist?list={playlist_id}"
-            html += f"<li><a href='{playlist_url}' target='_blank'>{title}</a></li>\n"
-        html += "</ol>\n"
-    else:
-        html += "<p>No playlists found.</p>\n"
+    if playlists is not None:
+        yield "<h2>Playlists</h2>\n"
+        if playlists:
+            yield "<ol>\n"
+            for playlist in playlists:
+                title = escape(playlist['snippet']['title'])
+                playlist_url = f"https://www.youtube.com/playlist?list={quote(playlist['id'])}"
+                if 'videos' not in playlist:
+                    yield f"<li><a href='{playlist_url}' target='_blank'>{title}</a></li>\n"
+                    continue
+                yield f"<li><a href='{playlist_url}' target='_blank'>{title}</a> ({len(playlist['videos'])} videos)\n<ol>\n"
+                for video in playlist['videos']:
+                    video_url = f"https://www.youtube.com/watch?v={quote(video['id'])}"
+                    yield (f"<li><a href='{video_url}' target='_blank'>{escape(video['title'])}</a>"
+                           f" <span class='stats'>[{video['duration']} | {video['views']:,} views]</span></li>\n")
+                yield "</ol>\n</li>\n"
+            yield "</ol>\n"
+        else:
+            yield "<p>No playlists found.</p>\n"
 
     # Videos section (using yt-dlp)
-    html += "<h2>Videos</h2>\n"
+    yield "<h2>Videos</h2>\n"
     if videos:
-        html += "<ol>\n"
+        yield f"<ol start='{video_start}'>\n"
         for video in videos:
-            video_id = video.get('id')
-            title = video.get('title', 'No Title')
-            video_url = f"https://www.youtube.com/watch?v={video_id}"
-            html += f"<li><a href='{video_url}' target='_blank'>{title}</a></li>\n"
-        html += "</ol>\n"
+            video_url = f"https://www.youtube.com/watch?v={quote(str(video.get('id')))}"
+            yield f"<li><a href='{video_url}' target='_blank'>{escape(video.get('title') or 'No Title')}</a></li>\n"
+        yield "</ol>\n"
     else:
-        html += "<p>No videos found.</p>\n"
+        yield "<p>No videos found.</p>\n"
 
-    html += """
+    yield """
 </body>
 </html>
 """
-    return html
 
-def main():
-    # Setup environment
+def generate_html(channel_title, playlists, videos):
+    """Generate an HTML string with channel, playlists, and videos info, applying the custom font."""
+    return "".join(iter_html(channel_title, playlists, videos))
+
+def write_html(filepath, channel_title, playlists, videos):
+    """Stream the HTML report to a file."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.writelines(iter_html(channel_title, playlists, videos))
+    return [filepath]
+
+def write_csv(filepath, channel_title, playlists, videos):
+    """Write one CSV row per playlist, playlist video and channel video."""
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['type', 'playlist', 'id', 'title', 'url', 'duration', 'views'])
+        for playlist in playlists:
+            playlist_title = playlist['snippet']['title']
+            writer.writerow(['playlist', playlist_title, playlist['id'], playlist_title,
+                             f"https://www.youtube.com/playlist?list={playlist['id']}", '', ''])
+            for video in playlist.get('videos', []):
+                writer.writerow(['playlist_video', playlist_title, video['id'], video['title'],
+                                 f"https://www.youtube.com/watch?v={video['id']}",
+                                 video['duration'], video['views']])
+        for video in videos:
+            writer.writerow(['video', '', video.get('id'), video.get('title'),
+                             f"https://www.youtube.com/watch?v={video.get('id')}",
+                             video.get('duration') or '', video.get('view_count') or ''])
+    return [filepath]
+
+def write_json(filepath, channel_title, playlists, videos):
+    """Write the report data as JSON without any HTML/PDF rendering."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({
+            'channel': channel_title,
+            'playlists': [{
+                'id': playlist['id'],
+                'title': playlist['snippet']['title'],
+                'videos': playlist.get('videos'),
+            } for playlist in playlists],
+            'videos': videos,
+        }, f, ensure_ascii=False, indent=1)
+    return [filepath]
+
+def write_pdf(filepath, channel_title, playlists, videos):
+    """
+    Render the report with WeasyPrint, splitting channels with more than
+    PDF_CHUNK_SIZE videos into numbered parts so each render stays small.
+    The first part also carries the playlists.
+    """
+    if len(videos) <= PDF_CHUNK_SIZE:
+        HTML(string=generate_html(channel_title, playlists, videos)).write_pdf(filepath)
+        return [filepath]
+
+    base, ext = os.path.splitext(filepath)
+    filepaths = []
+    for part, start in enumerate(range(0, len(videos), PDF_CHUNK_SIZE), start=1):
+        part_path = f"{base}_part{part}{ext}"
+        part_html = "".join(iter_html(channel_title, playlists if part == 1 else None,
+                                      videos[start:start + PDF_CHUNK_SIZE], video_start=start + 1))
+        HTML(string=part_html).write_pdf(part_path)
+        del part_html
+        filepaths.append(part_path)
+    return filepaths
+
+REPORT_WRITERS = {
+    'pdf': write_pdf,
+    'html': write_html,
+    'csv': write_csv,
+    'json': write_json,
+}
+
+async def fetch_channel_data(session, api_key, channel_url, snapshot, expand=False):
+    """
+    Fetch channel title, playlists and the yt-dlp video listing concurrently.
+    Once the channel ID is known (from the snapshot, or resolved first), the
+    yt-dlp listing, channel info and playlist paging all run at the same time.
+    Blocking calls run in worker threads and share the pooled session.
+    The snapshot of the previous run supplies the channel ID, ETags and known
+    videos, and is updated in place for the next run; only the ETags of requests
+    made in this run are kept, so pages that no longer exist drop out.
+    """
+    store = EtagStore(snapshot['etags'])
+    # A cancelled to_thread task keeps running, so resolve the ID before listing
+    channel_id = snapshot['channel_id'] or await asyncio.to_thread(
+        get_channel_id, session, api_key, channel_url)
+    if not channel_id:
+        return None, None, None, None
+    videos_task = asyncio.create_task(
+        asyncio.to_thread(get_videos_ytdlp, channel_url, snapshot['videos']))
+
+    channel_title, playlists = await asyncio.gather(
+        asyncio.to_thread(get_channel_info, session, api_key, channel_id, store),
+        asyncio.to_thread(get_playlists, session, api_key, channel_id, store),
+    )
+    if expand and playlists:
+        await expand_playlists(session, api_key, playlists, store)
+    videos = await videos_task
+    snapshot['channel_id'] = channel_id
+    snapshot['etags'] = store.used
+    snapshot['videos'] = videos
+    return channel_id, channel_title, playlists, videos
+
+def build_report(channel_url, expand=False, full_refresh=False, output_format='pdf', session=None):
+    """
+    Fetch channel data and write the report; returns the written file paths.
+    Passing a `session` lets long-running callers reuse its connection pool.
+    """
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    # Get channel URL from user (fast-loading part)
-    channel_url = input("Enter YouTube Channel URL: ").strip()
-    
-    # Heavy imports moved here
-    global requests, HTML, yt_dlp
-    import requests
-    from weasyprint import HTML
-    import yt_dlp
 
     # Get API key (automatically handled)
     api_key = get_api_key()
 
-    # Get channel ID (for API calls)
-    channel_id = get_channel_id(api_key, channel_url)
+    # Get channel ID, channel info, playlists (API) and videos (yt-dlp, to save API quota)
+    session = session or create_session()
+    snapshot = {'channel_id': None, 'etags': {}, 'videos': []} if full_refresh else load_snapshot(channel_url)
+    known_videos = len(snapshot['videos'])
+    channel_id, channel_title, playlists, videos = asyncio.run(
+        fetch_channel_data(session, api_key, channel_url, snapshot, expand))
     if not channel_id:
         print("❌ Could not extract channel ID from URL")
-        return
-
-    # Get channel info using API
-    channel_title = get_channel_info(api_key, channel_id)
+        return None
+    save_snapshot(channel_url, snapshot)
+    if known_videos:
+        print(f"ℹ️ Incremental update: {len(videos) - known_videos} new videos since the last run")
     sanitized_title = sanitize_filename(channel_title)
 
-    # Fetch playlists using API
-    playlists = get_playlists(api_key, channel_id)
-
-    # Fetch videos using yt-dlp (to save API quota)
-    videos = get_videos_ytdlp(channel_url)
-
     if not playlists and not videos:
         print("ℹ️ No playlists or videos found for this channel")
-        return
+        return []
 
-    # Generate HTML content from channel info, playlists, and videos
-    html_content = generate_html(channel_title, playlists, videos)
-    
-    # Create output file with .pdf extension
-    filename = f"{sanitized_title}_Info.pdf"
+    # Write the report in the chosen format (PDF via WeasyPrint)
+    filename = f"{sanitized_title}_Info.{output_format}"
     filepath = os.path.join(OUTPUT_DIR, filename)
+    filepaths = REPORT_WRITERS[output_format](filepath, channel_title, playlists, videos)
+
+    print(f"\n✅ Successfully saved channel info with {len(playlists)} playlists and {len(videos)} videos to {output_format.upper()}:")
+    for filepath in filepaths:
+        print(f"📁 {filepath}")
+    return filepaths
 
-    # Convert HTML to PDF using WeasyPrint
-    HTML(string=html_content).write_pdf(filepath)
+def main():
+    # Get channel URL from user (fast-loading part)
+    channel_url = input("Enter YouTube Channel URL: ").strip()
+    expand = input("Include videos of each playlist? (y/N): ").strip().lower() == 'y'
+    full_refresh = input("Full refresh instead of incremental update? (y/N): ").strip().lower() == 'y'
+    output_format = input("Output format [pdf/html/csv/json] (Enter for pdf): ").strip().lower() or 'pdf'
+    if output_format not in REPORT_WRITERS:
+        print(f"❌ Unknown output format: {output_format}")
+        return
 
-    print(f"\n✅ Successfully saved channel info with {len(playlists)} playlists and {len(videos)} videos to PDF:")
-    print(f"📁 {filepath}")
+    build_report(channel_url, expand, full_refresh, output_format)
 
 if __name__ == "__main__":
     main()
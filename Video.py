@@ -1,4 +1,28 @@
-# No top-level imports
+import os
+import re
+import sys
+import time
+import threading
+import subprocess
+import shutil
+import contextlib
+import concurrent.futures
+import hashlib
+import json
+
+from lazy_imports import lazy_class, lazy_from, lazy_import
+from platforms import get_profile
+from archive import DownloadArchive, archive_id, archive_variant, youtube_video_id
+from numbering import allocate_numbers
+from extract_cache import get_cache
+from sponsorblock import REMOVE_CATEGORIES, sponsorblock_pp
+from bandwidth import get_scheduler
+from adaptive import get_controller
+from metrics import get_bus
+
+# yt-dlp is only imported once a download path needs it
+YoutubeDL = lazy_from('yt_dlp', 'YoutubeDL')
+yt_dlp_postprocessor = lazy_import('yt_dlp.postprocessor')
 
 class TextStyles:
     HEADER = '\033[95m'
@@ -70,19 +94,6 @@ class Spinner:
         self.thread.join()
 
 
-def detect_platform(url):
-    platform_map = {
-        'youtube.com': 'YouTube',
-        'youtu.be': 'YouTube',
-        'facebook.com': 'Facebook',
-        'instagram.com': 'Instagram'
-    }
-    for domain, platform in platform_map.items():
-        if domain in url:
-            return platform
-    return 'Other'
-
-
 def sanitize_title(title, max_length=150):
     cleaned = re.sub(r'[\\/*?:"<>|]', '', title).strip().replace('/', '-')
     return cleaned[:max_length]
@@ -97,155 +108,404 @@ def get_platform_title(info, platform):
     return sanitize_title(title)
 
 
-def get_best_format(platform):
+def log_adaptive(message):
+    print(TextStyles.progress(message))
+
+
+# Codecs that can be stream-copied into an MP4 container as they are
+MP4_VIDEO_CODECS = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'hevc', 'h265', 'av01', 'vp09', 'vp9')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3', 'opus', 'ac-3', 'ec-3', 'flac', 'alac')
+
+
+def plan_mp4_postprocessing(info):
+    """Return (action, reason) with action 'keep', 'remux' or 'transcode' to get an MP4."""
+    ext = os.path.splitext(info.get('filepath') or '')[1].lstrip('.').lower() or info.get('ext')
+    vcodec, acodec = info.get('vcodec'), info.get('acodec')
+    codecs = f"{vcodec or '?'}/{acodec or '?'}"
+    if ext == 'mp4':
+        return 'keep', f"already mp4, {codecs}"
+    if vcodec is None or acodec is None:
+        return 'transcode', f"{ext} -> mp4, unknown codecs"
+    video_ok = vcodec == 'none' or vcodec.lower().startswith(MP4_VIDEO_CODECS)
+    audio_ok = acodec == 'none' or acodec.lower().startswith(MP4_AUDIO_CODECS)
+    if video_ok and audio_ok:
+        return 'remux', f"{ext} -> mp4, stream copy of {codecs}"
+    return 'transcode', f"{ext} -> mp4, re-encode of {codecs}"
+
+
+@lazy_class
+def mp4_planner_class():
+    class MP4PlannerPP(yt_dlp_postprocessor.PostProcessor):
+        """Run the remuxer, the converter or nothing, as planned for each file."""
+
+        def __init__(self, downloader=None, report=None):
+            super().__init__(downloader)
+            self.report = report
+
+        def run(self, info):
+            action, reason = plan_mp4_postprocessing(info)
+            if self.report:
+                self.report(action, reason)
+            if action == 'remux':
+                return yt_dlp_postprocessor.FFmpegVideoRemuxerPP(self._downloader, preferedformat='mp4').run(info)
+            if action == 'transcode':
+                return yt_dlp_postprocessor.FFmpegVideoConvertorPP(self._downloader, preferedformat='mp4').run(info)
+            return [], info
+
+    return MP4PlannerPP
+
+
+def format_end_time(video_duration, skip_seconds):
+    if not video_duration:
+        return ''
+    end_time = max(0, float(video_duration) - skip_seconds)
+    hours = int(end_time // 3600)
+    minutes = int((end_time % 3600) // 60)
+    seconds = int(end_time % 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def time_to_seconds(time_str):
+    parts = list(map(int, time_str.split(':')))
+    seconds = 0
+    for i, part in enumerate(reversed(parts)):
+        seconds += part * (60 ** i)
+    return seconds
+
+
+# fast:    download only the clip and stream-copy it (starts on the nearest keyframe)
+# smart:   fast, then re-encode just the frames before the first keyframe
+# precise: let yt-dlp re-encode the downloaded clip with keyframes at the cuts
+TRIM_MODES = ('fast', 'smart', 'precise')
+# Codecs smart cut can splice: encoder and the bitstream filter that puts the
+# parameter sets in-band, so the re-encoded head and the copied rest can be
+# joined as MPEG-TS even though their encoders differ
+SMART_CUT_CODECS = {'h264': ('libx264', 'h264_mp4toannexb'), 'hevc': ('libx265', 'hevc_mp4toannexb')}
+X264_PROFILES = {'constrained baseline': 'baseline', 'baseline': 'baseline', 'main': 'main', 'high': 'high',
+                 'high 10': 'high10', 'high 4:2:2': 'high422', 'high 4:4:4 predictive': 'high444'}
+
+
+def make_trim_ranges(start_seconds, skip_seconds):
+    """yt-dlp `download_ranges` callback; the end comes from each video's own duration."""
+    def trim_ranges(info_dict, ydl):
+        section = {'start_time': start_seconds}
+        duration = info_dict.get('duration')
+        if duration:
+            section['end_time'] = max(start_seconds, float(duration) - skip_seconds)
+        yield section
+    return trim_ranges
+
+
+def probe_video_stream(ffprobe, path):
+    """Return the first video stream of `path` as ffprobe reports it (codec, profile, level, pix_fmt)."""
+    output = subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+         'stream=codec_name,profile,level,pix_fmt', '-of', 'json', path],
+        capture_output=True, text=True, check=True).stdout
+    streams = json.loads(output).get('streams') or [{}]
+    return streams[0]
+
+
+def probe_first_keyframe(ffprobe, path):
+    """Return the time of the first keyframe of `path` at or after 0s, or None."""
+    frames = subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+         '-read_intervals', '%+60', '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True).stdout.split()
+    keyframes = [float(t) for t in frames if t.replace('.', '', 1).lstrip('-').isdigit()]
+    return next((t for t in keyframes if t >= 0), None)
+
+
+def probe_duration(ffprobe, path):
+    output = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True).stdout.strip()
+    return float(output)
+
+
+def encoder_args(stream):
+    """Encoder options that match the copied stream's profile, level and pixel format."""
+    codec = stream.get('codec_name')
+    args = ['-c:v', SMART_CUT_CODECS[codec][0], '-crf', '18']
+    if stream.get('pix_fmt'):
+        args += ['-pix_fmt', stream['pix_fmt']]
+    profile = (stream.get('profile') or '').lower()
+    level = stream.get('level')
+    if codec == 'h264':
+        if profile in X264_PROFILES:
+            args += ['-profile:v', X264_PROFILES[profile]]
+        if isinstance(level, int) and level > 0:
+            args += ['-level:v', f'{level / 10:.1f}']
+    elif profile in ('main', 'main 10'):
+        args += ['-profile:v', profile.replace(' ', '')]
+    return args
+
+
+def smart_cut(path):
+    """Re-encode a clip's head up to its first keyframe; False keeps the fast cut as it is."""
+    ffmpeg, ffprobe = shutil.which('ffmpeg'), shutil.which('ffprobe')
+    if not ffmpeg or not ffprobe:
+        return False
+    base, ext = os.path.splitext(path)
+    head, tail, concat_list, output = (f'{base}.head.ts', f'{base}.tail.ts',
+                                       f'{base}.concat.txt', f'{base}.cut{ext}')
+    try:
+        stream = probe_video_stream(ffprobe, path)
+        codec = stream.get('codec_name')
+        if codec not in SMART_CUT_CODECS:
+            return False
+        keyframe = probe_first_keyframe(ffprobe, path)
+        if keyframe is None:
+            return False
+        if keyframe < 0.05:
+            return True  # already starts on a keyframe
+        bsf = SMART_CUT_CODECS[codec][1]
+        subprocess.run([ffmpeg, '-y', '-v', 'error', '-i', path, '-t', f'{keyframe:.3f}', '-map', '0:v:0', '-an',
+                        *encoder_args(stream), '-bsf:v', bsf, '-f', 'mpegts', head],
+                       capture_output=True, check=True)
+        subprocess.run([ffmpeg, '-y', '-v', 'error', '-ss', f'{keyframe:.3f}', '-i', path, '-map', '0:v:0', '-an',
+                        '-c:v', 'copy', '-bsf:v', bsf, '-f', 'mpegts', tail],
+                       capture_output=True, check=True)
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            for part in (head, tail):
+                escaped = part.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        # Video from the joined parts, audio copied whole from the clip so it has no seam
+        subprocess.run([ffmpeg, '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', concat_list,
+                        '-i', path, '-map', '0:v:0', '-map', '1:a?', '-c', 'copy', '-movflags', '+faststart',
+                        output],
+                       capture_output=True, check=True)
+
+        # Only keep the result if it decodes cleanly and is as long as the clip
+        decode = subprocess.run([ffmpeg, '-v', 'error', '-xerror', '-i', output, '-map', '0:v:0', '-f', 'null', '-'],
+                                capture_output=True, text=True)
+        if decode.returncode != 0 or decode.stderr.strip():
+            return False
+        if abs(probe_duration(ffprobe, output) - probe_duration(ffprobe, path)) > 0.5:
+            return False
+        os.replace(output, path)
+        return True
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return False
+    finally:
+        for temp_path in (head, tail, concat_list, output):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class JobJournal:
+    """Checkpoint of a playlist run, keyed by entry ID, so an interrupted job resumes."""
+
+    def __init__(self, output_directory, url):
+        job_id = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        self.path = os.path.join(output_directory, f'.job_{job_id}.json')
+        self.lock = threading.Lock()
+        self.state = {'url': url, 'counters': {}, 'completed': {}, 'in_progress': []}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('url') == url and 'counters' in state:
+                    self.state = state
+            except (OSError, ValueError):
+                pass
+
+    @property
+    def resumed(self):
+        return bool(self.state['completed'] or self.state['in_progress'])
+
+    def counter(self, key):
+        return self.state['counters'].get(key)
+
+    def assign(self, key, item_counter):
+        self.state['counters'][key] = item_counter
+
+    def is_done(self, key):
+        return self.state['completed'].get(key) is True
+
+    def start(self, key):
+        with self.lock:
+            if key not in self.state['in_progress']:
+                self.state['in_progress'].append(key)
+            self._save()
+
+    def finish(self, key, success):
+        with self.lock:
+            self.state['completed'][key] = success
+            if key in self.state['in_progress']:
+                self.state['in_progress'].remove(key)
+            self._save()
+
+    def _save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def get_archive_key(entry, video_url, platform):
     if platform == 'YouTube':
-        return 'bestvideo[height<=1080][vcodec^=avc1]+bestaudio/best[height<=720]/best'
-    return 'best'
+        return 'youtube', youtube_video_id(video_url) or entry.get('id')
+    extractor = entry.get('ie_key') or entry.get('extractor_key') or platform
+    return extractor, archive_id(extractor, entry.get('id'), video_url)
+
+
+def get_entry_key(entry, url, platform):
+    """Stable journal key of a playlist entry: 'extractor:id', or its URL without an ID."""
+    video_url = entry.get('url') or url
+    extractor, video_id = get_archive_key(entry, video_url, platform)
+    return f'{extractor}:{video_id}' if video_id else video_url
+
+
+def download_entry(entry, item_counter, job):
+    """Download one playlist entry with the run settings in `job`; returns success."""
+    platform = job['platform']
+    quiet = job['quiet']
+    video_url = entry.get('url') or job['url']
+    video_title = get_platform_title(entry, platform)
+    video_duration = entry.get('duration', 0)
+    end_time_str = format_end_time(video_duration, job['skip_seconds'])
+
+    extractor, video_id = get_archive_key(entry, video_url, platform)
+    archived_path = job['archive'].lookup(extractor, video_id, job['archive_variant'])
+    if archived_path:
+        print(TextStyles.success(f"[{item_counter}/{job['total_items']}] Already downloaded, skipping: {archived_path}"))
+        return True
 
+    if quiet:
+        print(TextStyles.progress(f"[{item_counter}/{job['total_items']}] Starting: {video_title}"))
+    else:
+        print(f"\n{TextStyles.BOLD}{TextStyles.YELLOW}▶ Item {item_counter}/{job['total_items']}{TextStyles.END}")
+        print(TextStyles.progress(f"Title: {video_title}"))
+        if video_duration:
+            print(TextStyles.progress(f"Duration: {video_duration}s | Trim: {job['start_time'] or '0:00'} - {end_time_str}"))
+
+    if platform in ['Instagram', 'Facebook']:
+        output_template = f'Social Media download {item_counter} {video_title}.%(ext)s'
+    elif platform == 'YouTube' and job['total_items'] > 1:
+        output_template = f'{item_counter}.{video_title}.%(ext)s'
+    else:
+        output_template = f'{video_title}.%(ext)s'
+
+    final_paths = []
+    # Chunk size and fragments adapt to the link; the total rate is capped by the shared scheduler
+    controller = get_controller(job['profile'].name, log=log_adaptive)
+    transfer = controller.start()
+    scheduler = get_scheduler()
+    fragments = scheduler.fragment_concurrency(default=transfer.fragments)
+    transfer.fragments = fragments
+    ydl_opts = dict(job['profile'].ydl_params())
+    ydl_opts.update({
+        'format': job['profile'].video_format,
+        'merge_output_format': 'mp4',
+        'outtmpl': os.path.join(job['output_directory'], output_template),
+        'http_chunk_size': transfer.chunk_size,
+        'concurrent_fragment_downloads': fragments,
+        'progress_hooks': [get_bus().hook(f"{item_counter}. {video_title}"),
+                           scheduler.progress_hook(fragments), transfer.hook] + job['hooks'],
+        'postprocessor_hooks': [get_bus().postprocessor_hook],
+        # Progress is drawn by the metrics bus
+        'noprogress': True,
+        'post_hooks': [final_paths.append],
+        'windowsfilenames': True,
+        'continuedl': True,
+    })
+    if quiet:
+        ydl_opts['quiet'] = True
+
+    if job['sponsor_block_active']:
+        ydl_opts['writethumbnail'] = True
+        ydl_opts['postprocessors'] = [{'key': 'ModifyChapters', 'remove_sponsor_segments': REMOVE_CATEGORIES}]
+
+    if job['trim_ranges']:
+        # Only the clip is fetched; 'precise' re-encodes that clip, never the whole video
+        ydl_opts['download_ranges'] = job['trim_ranges']
+        ydl_opts['force_keyframes_at_cuts'] = job['trim_mode'] == 'precise'
+
+    def report_plan(action, reason):
+        print(TextStyles.progress(f"Post-processing {video_title}: {action} ({reason})"))
 
-def get_next_social_media_number(directory):
-    if not os.path.exists(directory):
-        return 1
-        
-    existing_files = [f for f in os.listdir(directory) 
-                     if f.startswith('Social Media download')]
-    max_number = 0
-    
-    for filename in existing_files:
-        match = re.search(r'Social Media download (\d+)', filename)
-        if match:
-            current_num = int(match.group(1))
-            max_number = max(max_number, current_num)
-            
-    return max_number + 1
-
-
-def check_dependency_executable():
-    import shutil  # Added import here to ensure shutil is defined
-    yt_dlp_path = shutil.which("yt-dlp")
-    if yt_dlp_path is None:
-        print(TextStyles.fail("Error: yt-dlp executable not found. Please install yt-dlp."))
-        sys.exit(1)
-    return yt_dlp_path
-
-
-def my_progress_hook(d):
-    if d.get('status') == 'downloading':
-        speed = d.get('speed') or 0
-        speed_kb = speed / 1024 if speed else 0
-        eta = d.get('eta') or 0
-        percent = d.get('_percent_str', '').strip()
-        sys.stdout.write(f"\rDownloading {d.get('filename', 'video')}: {percent} at {speed_kb:.2f} kB/s, ETA: {eta}s")
-        sys.stdout.flush()
-    elif d.get('status') == 'finished':
-        sys.stdout.write("\nDownload complete!\n")
-
-
-def download_video_subprocess(yt_dlp_path, video_url, output_directory, output_template, video_title):
-    sponsorblock_categories = 'sponsor,selfpromo,interaction,intro,outro,preview'
-    command = [
-        yt_dlp_path,
-        '--cookies', '/storage/emulated/0/YouTube/Cookies/cookies.txt',
-        '--sponsorblock-remove', sponsorblock_categories,
-        '--embed-thumbnail',
-        '--concurrent-fragments', '5',
-        '-f', 'bestvideo[height<=1080][vcodec^=avc1]+bestaudio/best[height<=720]/best',
-        '-o', os.path.join(output_directory, output_template),
-        video_url
-    ]
     try:
-        from yt_dlp import YoutubeDL
-        print(TextStyles.progress("Downloading (subprocess): " + video_title))
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        while True:
-            line = process.stdout.readline()
-            if not line:
-                break
-            sys.stdout.write(line)
-            sys.stdout.flush()
-        process.wait()
-        if process.returncode != 0:
-            print(TextStyles.fail(f"Download failed: {video_title}"))
-            return False
+        with YoutubeDL(ydl_opts) as ydl:
+            if job['sponsor_block_active']:
+                ydl.add_post_processor(sponsorblock_pp(ydl), when='after_filter')
+            # After ModifyChapters cut the segments, before the thumbnail goes into the final container
+            ydl.add_post_processor(mp4_planner_class()(ydl, report=report_plan), when='post_process')
+            if job['sponsor_block_active']:
+                ydl.add_post_processor(yt_dlp_postprocessor.EmbedThumbnailPP(ydl), when='post_process')
+            get_cache().download(ydl, video_url)
+        controller.finish(transfer)
+        if final_paths and job['trim_ranges'] and job['trim_mode'] == 'smart':
+            if not smart_cut(final_paths[-1]):
+                print(TextStyles.warning(f"Smart cut unavailable, kept keyframe-aligned cut: {video_title}"))
+        if final_paths:
+            job['archive'].record(extractor, video_id, final_paths[-1], job['archive_variant'])
         print(TextStyles.success(f"Completed: {video_title}"))
         return True
-    except subprocess.CalledProcessError as e:
-        print(TextStyles.fail(f"Download failed: {e}"))
+    except Exception as e:
+        controller.finish(transfer, success=False)
+        get_bus().record_failure('item')
+        print(TextStyles.fail(f"Download failed: {video_title}: {e}"))
         return False
 
 
-def main():
-    # Prompt for URL and detect platform before heavy imports
-    url = input(TextStyles.input_prompt("Enter URL (YouTube/Facebook/Instagram): ")).strip()
-    if not url:
-        print(TextStyles.fail("Invalid URL. Exiting..."))
-        return
-
-    platform = detect_platform(url)
-    print(TextStyles.success(f"Detected platform: {platform}"))
+def download_url(url, start_time='', skip_seconds=0, max_workers=None, hooks=None, interactive=True,
+                 trim_mode='fast', cancelled=None):
+    """Download a video or playlist; returns a summary dict, or None if extraction failed."""
+    profile = get_profile(url)
+    platform = profile.name
 
-    sponsor_block_active = False
-    yt_dlp_executable = None
-    if platform == 'YouTube':
-        start_time = input(TextStyles.input_prompt("Start time (e.g., '1:00' or Enter for full video): ")).strip()
-        skip_seconds = input(TextStyles.input_prompt("Seconds to skip from end (Enter for none): ")).strip() or '0'
+    trim_ranges = None
+    variant = archive_variant('video')
+    if start_time or skip_seconds:
         try:
-            from yt_dlp import YoutubeDL
-            skip_seconds = int(skip_seconds)
-            if skip_seconds < 0:
-                raise ValueError
+            start_seconds = time_to_seconds(start_time or '0')
         except ValueError:
-            print(TextStyles.fail("Invalid skip seconds. Exiting..."))
-            return
+            print(TextStyles.fail(f"Invalid start time: {start_time}"))
+            return None
+        if trim_mode not in TRIM_MODES:
+            print(TextStyles.fail(f"Unknown trim mode: {trim_mode}"))
+            return None
+        trim_ranges = make_trim_ranges(start_seconds, skip_seconds)
+        # A clip is archived apart from the full video and from clips cut another way
+        variant = archive_variant('video', start_seconds, skip_seconds, trim_mode)
 
-        if not start_time and skip_seconds == 0:
-            sponsor_block_active = True
-            yt_dlp_executable = check_dependency_executable()
-            print(TextStyles.success("SponsorBlock is active for this download."))
-    else:
-        start_time = ''
-        skip_seconds = 0
+    sponsor_block_active = False
+    if platform == 'YouTube' and not start_time and skip_seconds == 0:
+        sponsor_block_active = True
+        print(TextStyles.success("SponsorBlock is active for this download."))
 
-    # Now import heavy libraries and assign to globals
-    import os
-    import re
-    import sys
-    import time
-    import threading
-    import subprocess
-    import shutil
-    from yt_dlp import YoutubeDL
-
-    globals()['os'] = os
-    globals()['re'] = re
-    globals()['sys'] = sys
-    globals()['time'] = time
-    globals()['threading'] = threading
-    globals()['subprocess'] = subprocess
-    globals()['shutil'] = shutil
-    globals()['YoutubeDL'] = YoutubeDL
+    archive = DownloadArchive()
+    if platform == 'YouTube' and 'list=' not in url:
+        archived_path = archive.lookup('youtube', youtube_video_id(url), variant)
+        if archived_path:
+            print(TextStyles.success(f"Already downloaded: {TextStyles.UNDERLINE}{archived_path}{TextStyles.END}"))
+            return {'success': 1, 'total': 1, 'failed': [], 'output_directory': os.path.dirname(archived_path)}
 
     base_directory = '/storage/emulated/0/YouTube/Video/'
     print(TextStyles.section("Directory Setup"))
     os.makedirs(base_directory, exist_ok=True)
 
     print(TextStyles.section("Content Information"))
-    ydl_opts = {
+    ydl_opts = dict(profile.ydl_params())
+    ydl_opts.update({
         'quiet': True,
         'extract_flat': True,
         'force_generic_extractor': True,
-        'cookiefile': '/storage/emulated/0/YouTube/Cookies/instagram_cookies.txt' if platform == 'Instagram' else '/storage/emulated/0/YouTube/Cookies/cookies.txt',
-        'headers': {
-            'User-Agent': 'Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.5993.169 Mobile Safari/537.36',
-            'Referer': 'https://www.instagram.com/' if platform == 'Instagram' else 'https://www.google.com/'
-        },
-    }
+    })
 
     try:
-        with Spinner("Analyzing content..."):
+        with (Spinner("Analyzing content...") if interactive else contextlib.nullcontext()):
             with YoutubeDL(ydl_opts) as ydl:
-                content_info = ydl.extract_info(url, download=False)
-                entries = content_info.get('entries', [content_info])
+                # A single video is fully extracted here (extract_flat only keeps playlist
+                # entries flat), so the download reuses this extraction from the cache
+                content_info = get_cache().extract(ydl, url)
+                # A processed single video carries its stream URL as 'url'; keep the page URL
+                entries = content_info['entries'] if 'entries' in content_info else [dict(content_info, url=url)]
                 total_items = len(entries)
                 
                 if platform in ['Instagram', 'Facebook']:
@@ -266,104 +526,162 @@ def main():
                     print(f"\n{TextStyles.success('Output directory: ' + TextStyles.UNDERLINE + output_directory + TextStyles.END)}")
     except Exception as e:
         print(TextStyles.fail(f"Content error: {e}"))
-        return
+        return None
 
     print(TextStyles.section("Download Process"))
     print(TextStyles.progress(f"Total items found: {total_items}"))
 
-    try:
-        if platform in ['Instagram', 'Facebook']:
-            item_counter = get_next_social_media_number(output_directory)
-        else:
-            item_counter = 1
-            
-        success_count = 0
-        for entry in entries:
-            print(f"\n{TextStyles.BOLD}{TextStyles.YELLOW}▶ Item {item_counter}/{total_items}{TextStyles.END}")
-            video_url = entry.get('url') or url
-            
-            video_title = get_platform_title(entry, platform)
-            video_duration = entry.get('duration', 0)
-
-            if video_duration:
-                end_time = max(0, float(video_duration) - skip_seconds)
-                hours = int(end_time // 3600)
-                minutes = int((end_time % 3600) // 60)
-                seconds = int(end_time % 60)
-                end_time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
-            else:
-                end_time_str = ''
-
-            print(TextStyles.progress(f"Title: {video_title}"))
-            if video_duration:
-                print(TextStyles.progress(f"Duration: {video_duration}s | Trim: {start_time or '0:00'} - {end_time_str}"))
+    if max_workers is not None:
+        max_workers = max(1, min(max_workers, total_items))
+    elif total_items > 1 and interactive:
+        default_workers = profile.concurrency
+        workers_input = input(TextStyles.input_prompt(f"Parallel downloads (Enter for {default_workers}): ")).strip()
+        try:
+            max_workers = max(1, min(int(workers_input or default_workers), total_items))
+        except ValueError:
+            print(TextStyles.warning("Invalid number of parallel downloads, using 1."))
+            max_workers = 1
+    else:
+        max_workers = 1
+
+    job = {
+        'url': url,
+        'platform': platform,
+        'profile': profile,
+        'start_time': start_time,
+        'skip_seconds': skip_seconds,
+        'total_items': total_items,
+        'output_directory': output_directory,
+        'sponsor_block_active': sponsor_block_active,
+        'trim_ranges': trim_ranges,
+        'trim_mode': trim_mode,
+        'quiet': max_workers > 1 or not interactive,
+        'hooks': list(hooks or []),
+        'archive': archive,
+        'archive_variant': variant,
+    }
 
+    bus = get_bus()
+    bus.start(render=interactive)
+    try:
+        journal = JobJournal(output_directory, url)
+        keyed_entries = [(get_entry_key(entry, url, platform), entry) for entry in entries]
+
+        # Counters are assigned up-front so output names keep playlist order
+        # regardless of which worker finishes first. Entries seen by an earlier
+        # run keep their number; new ones are numbered after every number used.
+        new_keys = list(dict.fromkeys(key for key, _ in keyed_entries if journal.counter(key) is None))
+        if new_keys:
             if platform in ['Instagram', 'Facebook']:
-                output_template = f'Social Media download {item_counter} {video_title}.%(ext)s'
-            elif platform == 'YouTube' and total_items > 1:
-                output_template = f'{item_counter}.{video_title}.%(ext)s'
-            else:
-                output_template = f'{video_title}.%(ext)s'
-
-            if sponsor_block_active:
-                success = download_video_subprocess(
-                    yt_dlp_executable,
-                    video_url,
-                    output_directory,
-                    output_template,
-                    video_title
-                )
-                if success:
-                    success_count += 1
+                next_counter = allocate_numbers(output_directory, 'Social Media download', len(new_keys))
             else:
-                ydl_opts = {
-                    'format': get_best_format(platform),
-                    'merge_output_format': 'mp4',
-                    'outtmpl': os.path.join(output_directory, output_template),
-                    'ratelimit': 20 * 1024 * 1024,
-                    'http_chunk_size': 10 * 1024 * 1024,
-                    'concurrent_fragment_downloads': 10,
-                    'postprocessors': [{
-                        'key': 'FFmpegVideoConvertor',
-                        'preferedformat': 'mp4',
-                    }],
-                    'progress_hooks': [my_progress_hook],
-                    'cookiefile': '/storage/emulated/0/YouTube/Cookies/instagram_cookies.txt' if platform == 'Instagram' else '/storage/emulated/0/YouTube/Cookies/cookies.txt',
-                    'headers': {
-                        'User-Agent': ('Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 '
-                                       '(KHTML, like Gecko) Chrome/118.0.5993.169 Mobile Safari/537.36') 
-                                       if platform == 'Instagram' 
-                                       else 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                                            '(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36'
-                    },
-                    'windowsfilenames': True,
-                    'postprocessor_args': []
+                next_counter = max(journal.state['counters'].values(), default=0) + 1
+            for key in new_keys:
+                journal.assign(key, next_counter)
+                next_counter += 1
+        numbered_entries = [(journal.counter(key), key, entry) for key, entry in keyed_entries]
+
+        results = {}
+        if journal.resumed:
+            done = sum(1 for _, key, _ in numbered_entries if journal.is_done(key))
+            print(TextStyles.success(f"Resuming previous run: {done}/{total_items} items already completed"))
+            in_progress = sorted(journal.counter(key) for key in journal.state['in_progress']
+                                 if journal.counter(key) is not None)
+            if in_progress:
+                print(TextStyles.progress(f"Continuing partial downloads for items: "
+                                          f"{', '.join(map(str, in_progress))}"))
+            for item_counter, key, _ in numbered_entries:
+                if journal.is_done(key):
+                    results[item_counter] = True
+        # A playlist can list the same video twice; both share a counter, download it once
+        numbered_pending = []
+        pending_keys = set()
+        for item_counter, key, entry in numbered_entries:
+            if item_counter not in results and key not in pending_keys:
+                pending_keys.add(key)
+                numbered_pending.append((item_counter, key, entry))
+
+        def run_entry(entry, key, item_counter):
+            if cancelled and cancelled():
+                return False  # cancelled: the remaining entries count as failed
+            journal.start(key)
+            success = download_entry(entry, item_counter, job)
+            journal.finish(key, success)
+            return success
+
+        if max_workers > 1:
+            print(TextStyles.progress(f"Downloading with {max_workers} parallel workers"))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(run_entry, entry, key, item_counter): item_counter
+                    for item_counter, key, entry in numbered_pending
                 }
+                for future in concurrent.futures.as_completed(futures):
+                    results[futures[future]] = future.result()
+        else:
+            for item_counter, key, entry in numbered_pending:
+                results[item_counter] = run_entry(entry, key, item_counter)
 
-                if start_time and end_time_str:
-                    ydl_opts['postprocessor_args'].extend(['-ss', start_time, '-to', end_time_str, '-vsync', '2', '-r', '30'])
-
-                try:
-                    with Spinner("Downloading..."):
-                        with YoutubeDL(ydl_opts) as ydl:
-                            ydl.download([video_url])
-                    success_count += 1
-                    print(TextStyles.success(f"Completed: {video_title}"))
-                except Exception as e:
-                    print(TextStyles.fail(f"Download failed: {e}"))
-
-            item_counter += 1
+        success_count = sum(1 for success in results.values() if success)
+        failed_items = [(item_counter, get_platform_title(entry, platform))
+                        for item_counter, _, entry in numbered_entries if not results.get(item_counter)]
+        if not failed_items:
+            journal.remove()
 
         print(f"\n{TextStyles.BOLD}{TextStyles.GREEN}{'⎯'*40}{TextStyles.END}")
         print(TextStyles.success(f"Successfully downloaded {success_count}/{total_items} items!"))
+        if failed_items:
+            print(TextStyles.warning(f"Failed items ({len(failed_items)}):"))
+            for item_counter, video_title in failed_items:
+                print(TextStyles.fail(f"{item_counter}. {video_title}"))
         if platform == 'YouTube' and total_items > 1:
             print(TextStyles.success(f"Playlist location: {TextStyles.UNDERLINE}{output_directory}{TextStyles.END}"))
         else:
             print(TextStyles.success(f"Videos saved to: {TextStyles.UNDERLINE}{output_directory}{TextStyles.END}"))
         print(f"{TextStyles.GREEN}🎉 All operations completed! 🎉{TextStyles.END}")
+        return {
+            'success': success_count,
+            'total': total_items,
+            'failed': failed_items,
+            'output_directory': output_directory,
+        }
 
     except Exception as e:
         print(TextStyles.fail(f"\nCritical error: {e}"))
+        return None
+    finally:
+        bus.close()
+
+
+def main():
+    # Prompt for URL and detect platform before heavy imports
+    url = input(TextStyles.input_prompt("Enter URL (YouTube/Facebook/Instagram): ")).strip()
+    if not url:
+        print(TextStyles.fail("Invalid URL. Exiting..."))
+        return
+
+    platform = get_profile(url).name
+    print(TextStyles.success(f"Detected platform: {platform}"))
+
+    if platform == 'YouTube':
+        start_time = input(TextStyles.input_prompt("Start time (e.g., '1:00' or Enter for full video): ")).strip()
+        skip_seconds = input(TextStyles.input_prompt("Seconds to skip from end (Enter for none): ")).strip() or '0'
+        try:
+            skip_seconds = int(skip_seconds)
+            if skip_seconds < 0:
+                raise ValueError
+        except ValueError:
+            print(TextStyles.fail("Invalid skip seconds. Exiting..."))
+            return
+        trim_mode = 'fast'
+        if start_time or skip_seconds:
+            trim_mode = input(TextStyles.input_prompt("Trim mode [fast/smart/precise] (Enter for fast): ")).strip().lower() or 'fast'
+    else:
+        start_time = ''
+        skip_seconds = 0
+        trim_mode = 'fast'
+
+    download_url(url, start_time, skip_seconds, trim_mode=trim_mode)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
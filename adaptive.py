@@ -0,0 +1,135 @@
+"""AIMD tuning of chunk size and fragment concurrency from live throughput.
+
+yt-dlp fixes `http_chunk_size` and `concurrent_fragment_downloads` when a
+download starts, so each controller watches one download through its progress
+hook and applies its decision to the next download on the same platform:
+additive increase while throughput holds up, multiplicative decrease after a
+failure or a throughput collapse. Chunks are also kept short enough to finish
+within CHUNK_SECONDS at the measured speed, so slow links do not time out.
+"""
+import threading
+import time
+
+MIN_FRAGMENTS = 1
+MAX_FRAGMENTS = 16
+MIN_CHUNK = 1024 * 1024
+MAX_CHUNK = 50 * 1024 * 1024
+CHUNK_STEP = 2 * 1024 * 1024
+CHUNK_SECONDS = 10
+# Throughput below this fraction of the previous download counts as congestion
+COLLAPSE_RATIO = 0.6
+# Downloads smaller or shorter than this say too little about the link
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024
+MIN_SAMPLE_SECONDS = 2
+
+
+class Transfer:
+    """Progress of one download, fed by its yt-dlp progress hook.
+
+    A download can be several files (video and audio formats fetched one after
+    the other), so bytes are counted per file and summed, and the rate covers
+    the time from the first progress report to the last file finishing, not
+    the merging and post-processing that follow.
+    """
+
+    def __init__(self, chunk_size, fragments):
+        self.chunk_size = chunk_size
+        self.fragments = fragments
+        self.started = None
+        self.ended = None
+        self.files = {}
+        self.failed = False
+
+    def hook(self, d):
+        status = d.get('status')
+        if status == 'error':
+            self.failed = True
+        elif status in ('downloading', 'finished'):
+            now = time.monotonic()
+            if self.started is None:
+                # Speed is measured from the first progress report, after connection setup
+                self.started = now - (d.get('elapsed') or 0)
+            key = d.get('tmpfilename') or d.get('filename')
+            self.files[key] = max(self.files.get(key, 0), d.get('downloaded_bytes') or 0)
+            if status == 'finished':
+                self.ended = now
+
+    @property
+    def downloaded(self):
+        return sum(self.files.values())
+
+    @property
+    def rate(self):
+        if self.started is None:
+            return None
+        elapsed = (self.ended or time.monotonic()) - self.started
+        if self.downloaded < MIN_SAMPLE_BYTES or elapsed < MIN_SAMPLE_SECONDS:
+            return None
+        return self.downloaded / elapsed
+
+
+class AdaptiveController:
+    def __init__(self, name, chunk_size=10 * 1024 * 1024, fragments=4, log=None):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.fragments = fragments
+        self.log = log
+        self.lock = threading.Lock()
+        self.last_rate = None
+        self.decisions = []
+
+    def start(self):
+        with self.lock:
+            return Transfer(self.chunk_size, self.fragments)
+
+    def finish(self, transfer, success=True):
+        """Apply the AIMD step for a finished `transfer` and return the decision."""
+        rate = transfer.rate
+        with self.lock:
+            if not success or transfer.failed:
+                action, reason = 'decrease', 'download failed'
+            elif rate is None:
+                return None
+            elif self.last_rate and rate < self.last_rate * COLLAPSE_RATIO:
+                action, reason = 'decrease', (f"throughput fell to {rate / 1024 / 1024:.2f} "
+                                              f"from {self.last_rate / 1024 / 1024:.2f} MiB/s")
+            else:
+                action, reason = 'increase', f"{rate / 1024 / 1024:.2f} MiB/s"
+
+            if action == 'decrease':
+                self.fragments = max(MIN_FRAGMENTS, self.fragments // 2)
+                self.chunk_size = max(MIN_CHUNK, self.chunk_size // 2)
+            else:
+                self.fragments = min(MAX_FRAGMENTS, self.fragments + 1)
+                self.chunk_size = min(MAX_CHUNK, self.chunk_size + CHUNK_STEP)
+            if rate:
+                per_connection = rate / max(1, transfer.fragments)
+                self.chunk_size = max(MIN_CHUNK, min(self.chunk_size, int(per_connection * CHUNK_SECONDS)))
+                self.last_rate = rate
+
+            decision = {
+                'time': time.time(),
+                'platform': self.name,
+                'action': action,
+                'reason': reason,
+                'rate': rate,
+                'chunk_size': self.chunk_size,
+                'fragments': self.fragments,
+            }
+            self.decisions.append(decision)
+        if self.log:
+            self.log(f"Adaptive {self.name}: {action} ({reason}) -> chunk "
+                     f"{self.chunk_size / 1024 / 1024:.1f} MiB, {self.fragments} fragments")
+        return decision
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name, log=None):
+    """One controller per platform, shared by every download in the process."""
+    with _controllers_lock:
+        if name not in _controllers:
+            _controllers[name] = AdaptiveController(name, log=log)
+        return _controllers[name]
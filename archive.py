@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+ARCHIVE_FILE = '/storage/emulated/0/YouTube/.download_archive.jsonl'
+
+
+def youtube_video_id(url):
+    """Return the YouTube video ID of a watch/shorts/youtu.be URL without any network work."""
+    match = re.search(r'(?:v=|youtu\.be/|/shorts/|/live/|/embed/)([0-9A-Za-z_-]{11})', url or '')
+    return match.group(1) if match else None
+
+
+def archive_variant(kind, start_seconds=0, skip_seconds=0, mode=''):
+    """Archive variant of a download: its output kind ('video', 'audio'), plus the trim if any."""
+    if not start_seconds and not skip_seconds:
+        return kind
+    return f"{kind}:trim={start_seconds:g}-{skip_seconds:g}" + (f":{mode}" if mode else '')
+
+
+def archive_id(extractor, video_id, url):
+    """ID to archive an item under; the generic extractor's IDs are only URL basenames, so add the host."""
+    if not video_id or str(extractor).lower() != 'generic':
+        return video_id
+    host = urlsplit(url or '').hostname
+    return f"{host}/{video_id}" if host else video_id
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadArchive:
+    """On-disk index of finished downloads keyed by extractor + video ID.
+
+    The `variant` (see archive_variant) keeps a video, its audio and trimmed
+    clips of either apart, so one is never mistaken for another.
+
+    Records are appended as JSON lines so adding one never rewrites the file;
+    the whole log is replayed into a dict once at startup, after which every
+    lookup is a single dict access plus a stat of the recorded file.
+    """
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self._load()
+
+    @staticmethod
+    def key(extractor, video_id, variant=''):
+        key = f"{str(extractor).lower()}:{video_id}"
+        return f"{key}#{variant}" if variant else key
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted run, ignore it
+                    continue
+                self.entries[record['key']] = record
+
+    def lookup(self, extractor, video_id, variant=''):
+        """Return the recorded file path if it still exists with the recorded size."""
+        if not video_id:
+            return None
+        record = self.entries.get(self.key(extractor, video_id, variant))
+        if not record:
+            return None
+        try:
+            if os.path.getsize(record['path']) != record['size']:
+                return None
+        except OSError:
+            return None
+        return record['path']
+
+    def record(self, extractor, video_id, path, variant=''):
+        if not video_id or not path or not os.path.exists(path):
+            return
+        record = {
+            'key': self.key(extractor, video_id, variant),
+            'path': path,
+            'size': os.path.getsize(path),
+            'sha256': file_checksum(path),
+        }
+        with self.lock:
+            self.entries[record['key']] = record
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
@@ -0,0 +1,158 @@
+"""Global bandwidth scheduling shared by every download in the process.
+
+YTDL_BANDWIDTH_LIMIT caps the total rate of all simultaneous downloads in
+bytes per second with K/M/G suffixes: DEFAULT_LIMIT when unset, '0' or an
+empty value for no limit. YTDL_BANDWIDTH_SCHEDULE overrides it by local time
+of day, e.g. '08:00-18:00=2M,23:00-07:00=0' (0 = no limit).
+"""
+import math
+import os
+import re
+import threading
+import time
+
+DEFAULT_FRAGMENTS = 10
+# Video.py capped each download at 20 MiB/s; now the cap is shared by all of them
+DEFAULT_LIMIT = '20M'
+# Transfers that report nothing for this long are treated as gone
+STALE_AFTER = 30
+
+
+def parse_rate(text):
+    """'1.5M' -> 1572864 bytes per second; '' or '0' -> None (unlimited)."""
+    if not (text or '').strip():
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', text or '', re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid rate: {text!r}")
+    rate = float(match.group(1)) * 1024 ** ' KMG'.index(match.group(2).upper() or ' ')
+    return int(rate) or None
+
+
+def parse_schedule(text):
+    """'08:00-18:00=2M,...' -> [(start_minute, end_minute, rate), ...]"""
+    schedule = []
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        match = re.fullmatch(r'(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(.+)', item)
+        if not match:
+            raise ValueError(f"Invalid schedule entry: {item!r}")
+        start = int(match.group(1)) * 60 + int(match.group(2))
+        end = int(match.group(3)) * 60 + int(match.group(4))
+        schedule.append((start, end, parse_rate(match.group(5))))
+    return schedule
+
+
+class TokenBucket:
+    """Token bucket that lets the balance go negative.
+
+    A consumer takes what it just received and then sleeps off any debt, so
+    large and small progress updates are both shaped to the same rate.
+    """
+
+    def __init__(self, rate=None):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.tokens = rate or 0
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self.lock:
+            if rate != self.rate:
+                self.rate = rate
+                self.tokens = min(self.tokens, rate or 0)
+
+    def consume(self, amount):
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            # One second of burst at most
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class BandwidthScheduler:
+    """Shape every download's progress through one token bucket.
+
+    Progress hooks run in the downloading thread (one per fragment worker with
+    concurrent fragments), so sleeping there throttles exactly the transfer
+    that went over budget. The measured throughput per connection decides how
+    many fragments the next download gets under the current cap.
+    """
+
+    def __init__(self, limit=None, schedule=None):
+        self.limit = limit
+        self.schedule = schedule or []
+        self.bucket = TokenBucket(self.current_limit())
+        self.lock = threading.Lock()
+        self.transfers = {}
+        self.connection_rate = None
+
+    @classmethod
+    def from_environment(cls):
+        return cls(parse_rate(os.environ.get('YTDL_BANDWIDTH_LIMIT', DEFAULT_LIMIT)),
+                   parse_schedule(os.environ.get('YTDL_BANDWIDTH_SCHEDULE', '')))
+
+    def current_limit(self, now=None):
+        now = now or time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, rate in self.schedule:
+            # A window like 23:00-07:00 wraps around midnight
+            if start <= minute < end or (end < start and (minute >= start or minute < end)):
+                return rate
+        return self.limit
+
+    def _active_transfers(self, now):
+        for key in [key for key, t in self.transfers.items() if now - t['seen'] > STALE_AFTER]:
+            del self.transfers[key]
+        return self.transfers
+
+    def fragment_concurrency(self, default=DEFAULT_FRAGMENTS):
+        """Fragments for the next download: `default`, or fewer if fewer fill its share of the cap."""
+        limit = self.current_limit()
+        with self.lock:
+            active = len(self._active_transfers(time.monotonic()))
+            connection_rate = self.connection_rate
+        if not limit or not connection_rate:
+            return default
+        share = limit / (active + 1)
+        return max(1, min(default, math.ceil(share / connection_rate)))
+
+    def progress_hook(self, fragments=1):
+        """Return a yt-dlp progress hook for one download using `fragments` connections."""
+        def hook(d):
+            key = d.get('tmpfilename') or d.get('filename')
+            now = time.monotonic()
+            if d.get('status') != 'downloading':
+                with self.lock:
+                    self.transfers.pop(key, None)
+                return
+            downloaded = d.get('downloaded_bytes') or 0
+            with self.lock:
+                transfer = self.transfers.setdefault(key, {'bytes': downloaded, 'seen': now})
+                delta = max(0, downloaded - transfer['bytes'])
+                transfer.update(bytes=max(downloaded, transfer['bytes']), seen=now)
+                speed = d.get('speed')
+                if speed:
+                    sample = speed / max(1, fragments)
+                    self.connection_rate = (sample if self.connection_rate is None
+                                            else 0.8 * self.connection_rate + 0.2 * sample)
+            self.bucket.set_rate(self.current_limit())
+            self.bucket.consume(delta)
+        return hook
+
+
+_default_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _default_scheduler
+    with _scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = BandwidthScheduler.from_environment()
+        return _default_scheduler
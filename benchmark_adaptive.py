@@ -0,0 +1,176 @@
+"""Benchmark the adaptive chunk/fragment controller against a throttled local server.
+
+The server stands in for a video host: a direct file with Range support
+(/video.mp4, tuned by http_chunk_size) and an HLS playlist of fragments
+(/hls/index.m3u8, tuned by concurrent_fragment_downloads). Each connection
+is throttled, the whole server shares one total rate, and requests can be
+delayed or dropped to mimic a mobile link.
+
+    python benchmark_adaptive.py --mode hls --per-connection 512K --total-rate 4M
+    python benchmark_adaptive.py --fixed           # baseline: 10 MiB chunks, 10 fragments
+    python benchmark_adaptive.py --serve           # only run the server
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from adaptive import AdaptiveController
+from bandwidth import TokenBucket, parse_rate
+from lazy_imports import lazy_from
+
+YoutubeDL = lazy_from('yt_dlp', 'YoutubeDL')
+
+BLOCK_SIZE = 64 * 1024
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        time.sleep(config.latency)
+        if config.fail_rate and random.random() < config.fail_rate:
+            # Drop the connection like a flaky mobile link
+            self.close_connection = True
+            return
+        if self.path == '/video.mp4':
+            self.send_range(config.size, 'video/mp4')
+        elif self.path == '/hls/index.m3u8':
+            self.send_playlist()
+        elif re.fullmatch(r'/hls/seg\d+\.ts', self.path):
+            self.send_range(config.segment_size, 'video/mp2t')
+        else:
+            self.send_error(404)
+
+    def send_playlist(self):
+        config = self.server.config
+        count = -(-config.size // config.segment_size)
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(count):
+            lines += ['#EXTINF:4.0,', f'seg{index}.ts']
+        body = ('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_range(self, size, content_type):
+        start, end = 0, size - 1
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(end, int(match.group(2))) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        connection = TokenBucket(self.server.config.per_connection)
+        remaining = end - start + 1
+        block = bytes(BLOCK_SIZE)
+        try:
+            while remaining > 0:
+                n = min(BLOCK_SIZE, remaining)
+                connection.consume(n)
+                self.server.total.consume(n)
+                self.wfile.write(block[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(config):
+    server = ThreadingHTTPServer(('127.0.0.1', config.port), ThrottledHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.total = TokenBucket(config.total_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_download(url, chunk_size, fragments, transfer, directory):
+    params = {
+        'outtmpl': os.path.join(directory, 'bench.%(ext)s'),
+        'quiet': True,
+        'noprogress': True,
+        'overwrites': True,
+        'fixup': 'never',
+        'http_chunk_size': chunk_size,
+        'concurrent_fragment_downloads': fragments,
+        'progress_hooks': [transfer.hook],
+        'retries': 3,
+        'fragment_retries': 3,
+    }
+    started = time.perf_counter()
+    try:
+        with YoutubeDL(params) as ydl:
+            ydl.download([url])
+        ok = True
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('file', 'hls'), default='file')
+    parser.add_argument('--runs', type=int, default=8)
+    parser.add_argument('--size', default='64M', help='bytes served per download (default: 64M)')
+    parser.add_argument('--segment-size', default='1M', help='HLS fragment size (default: 1M)')
+    parser.add_argument('--per-connection', default='2M', help='rate limit of each connection (default: 2M)')
+    parser.add_argument('--total-rate', default='16M', help='rate limit of the whole server (default: 16M)')
+    parser.add_argument('--latency', type=float, default=0.05, help='delay before every response, seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests dropped')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--fixed', action='store_true', help='keep 10 MiB chunks and 10 fragments')
+    parser.add_argument('--serve', action='store_true', help='only run the server')
+    args = parser.parse_args()
+    args.size = parse_rate(args.size)
+    args.segment_size = parse_rate(args.segment_size)
+    args.per_connection = parse_rate(args.per_connection)
+    args.total_rate = parse_rate(args.total_rate)
+
+    server = start_server(args)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    url = f'{base}/video.mp4' if args.mode == 'file' else f'{base}/hls/index.m3u8'
+    print(f"Serving {url}")
+    if args.serve:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    controller = AdaptiveController('bench', log=print)
+    directory = tempfile.mkdtemp(prefix='adaptive_bench_')
+    try:
+        print(f"{'run':>3}  {'chunk':>9}  {'frags':>5}  {'time':>7}  {'MiB/s':>6}  result")
+        for run in range(1, args.runs + 1):
+            transfer = controller.start()
+            if args.fixed:
+                transfer.chunk_size, transfer.fragments = 10 * 1024 * 1024, 10
+            ok, elapsed = run_download(url, transfer.chunk_size, transfer.fragments, transfer, directory)
+            print(f"{run:>3}  {transfer.chunk_size / 1024 / 1024:>6.1f}MiB  {transfer.fragments:>5}  "
+                  f"{elapsed:>6.2f}s  {args.size / elapsed / 1024 / 1024:>6.2f}  {'ok' if ok else 'failed'}")
+            if not args.fixed:
+                controller.finish(transfer, ok)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
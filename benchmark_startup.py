@@ -0,0 +1,101 @@
+"""Measure user-visible startup latency of the entry points.
+
+time-to-first-prompt: process start until the first prompt (or first line of
+output for scripts without a prompt) appears.
+time-to-first-byte: from submitting the URL until the first download progress
+(or, for Info.py, the finished report) is printed. Needs network access and a
+URL, so it is only measured for scripts given one with --url SCRIPT=URL.
+
+    python benchmark_startup.py --runs 5 --url Video.py=https://youtu.be/...
+"""
+import argparse
+import os
+import re
+import select
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# script: (extra args, answers fed after the URL, first-prompt pattern, first-byte pattern)
+SCRIPTS = {
+    'Video.py': ([], ['', '0', ''], r'Enter URL', r'\d+(\.\d+)?%'),
+    'Audio.py': ([], ['0', '0'], r'Enter URL', r'\d+(\.\d+)?%'),
+    'Info.py': ([], ['n', 'n', 'html'], r'Enter YouTube Channel URL', r'Successfully saved'),
+    'Automatic_Video.py': (['--watch', 'stdin', '--workers', '1'], [], r'Monitoring', r'\d+(\.\d+)?%'),
+}
+
+
+def wait_for(process, pattern, timeout, output):
+    """Read the process output until `pattern` matches; return the elapsed time or None."""
+    start = time.perf_counter()
+    regex = re.compile(pattern)
+    fd = process.stdout.fileno()
+    while time.perf_counter() - start < timeout:
+        ready, _, _ = select.select([fd], [], [], 0.05)
+        if ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+            output.append(chunk.decode('utf-8', 'replace'))
+            if regex.search(''.join(output)):
+                return time.perf_counter() - start
+    return None
+
+
+def run_once(script, url, timeout):
+    extra_args, answers, prompt_pattern, byte_pattern = SCRIPTS[script]
+    # Progress bars are what first-byte waits for, draw them on the pipe too
+    env = dict(os.environ, PYTHONUNBUFFERED='1', YTDL_PROGRESS='1')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, script)] + extra_args,
+                               cwd=HERE, env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = []
+    try:
+        first_prompt = None
+        if wait_for(process, prompt_pattern, timeout, output) is not None:
+            first_prompt = time.perf_counter() - start
+        first_byte = None
+        if url and first_prompt is not None:
+            output.clear()
+            process.stdin.write(('\n'.join([url] + answers) + '\n').encode())
+            process.stdin.flush()
+            first_byte = wait_for(process, byte_pattern, timeout, output)
+        return first_prompt, first_byte
+    finally:
+        process.kill()
+        process.wait()
+
+
+def summarize(samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return 'n/a'
+    return f"median {statistics.median(samples) * 1000:8.1f} ms  (min {min(samples) * 1000:.1f}, n={len(samples)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--url', action='append', default=[], metavar='SCRIPT=URL')
+    parser.add_argument('scripts', nargs='*', default=list(SCRIPTS))
+    args = parser.parse_args()
+    urls = dict(item.split('=', 1) for item in args.url)
+
+    for script in args.scripts:
+        prompts, bytes_ = [], []
+        for _ in range(args.runs):
+            first_prompt, first_byte = run_once(script, urls.get(script), args.timeout)
+            prompts.append(first_prompt)
+            bytes_.append(first_byte)
+        print(f"{script:20} first prompt: {summarize(prompts)}")
+        if script in urls:
+            print(f"{'':20} first byte:   {summarize(bytes_)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""Resident download service with a small local HTTP job API.
+
+Keeps one process (and so the imported yt-dlp extractors, cookies and HTTP
+connection pools) alive across jobs instead of paying for a fresh start on
+every download:
+
+    python daemon.py                       # http://127.0.0.1:8765
+    python daemon.py --socket /tmp/ytd.sock
+
+    POST   /jobs        {"type": "video", "url": "...", "options": {...}}
+    GET    /jobs        list all jobs
+    GET    /jobs/<id>   status, progress, result and error of one job
+    DELETE /jobs/<id>   cancel a queued or running job
+
+POST bodies must be sent as Content-Type: application/json, and requests whose
+Host is not this machine are refused, so web pages cannot submit jobs.
+
+Job options per type:
+    video  start_time ('M:SS'), skip_seconds, workers, trim_mode (fast/smart/precise)
+    audio  start_seconds, end_skip_seconds
+    info   expand, full_refresh, format (pdf/html/csv/json)
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from archive import DownloadArchive
+from lazy_imports import lazy_import
+from metrics import get_bus
+
+Video = lazy_import('Video')
+Audio = lazy_import('Audio')
+Info = lazy_import('Info')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+JOB_TYPES = ('video', 'audio', 'info')
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+# Finished, failed and cancelled jobs are forgotten after this many seconds
+JOB_RETENTION = 60 * 60
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_type, url, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.type = job_type
+        self.url = url
+        self.options = options
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook: record progress, abort the download once cancelled."""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+        self.progress = {
+            'status': d.get('status'),
+            'filename': d.get('filename'),
+            'downloaded_bytes': d.get('downloaded_bytes'),
+            'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+            'speed': d.get('speed'),
+            'eta': d.get('eta'),
+        }
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'url': self.url,
+            'options': self.options,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobManager:
+    """Runs submitted jobs on a shared worker pool.
+
+    Video and audio jobs are cancelled from inside yt-dlp through their
+    progress hook, and playlists also stop before their next entry;
+    channel-info jobs can only be cancelled before they start. Jobs that ended
+    more than JOB_RETENTION seconds ago are dropped.
+    """
+
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.archive = DownloadArchive()
+        self.local = threading.local()
+
+    def submit(self, job_type, url, options=None):
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type!r}")
+        if not url:
+            raise ValueError("Missing url")
+        job = Job(job_type, url, options or {})
+        with self.lock:
+            self._evict_finished()
+            self.jobs[job.id] = job
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            self._evict_finished()
+            return list(self.jobs.values())
+
+    def _evict_finished(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future.cancel():
+            job.status = 'cancelled'
+            job.finished = time.time()
+        return job
+
+    def _session(self):
+        # One pooled API session per worker thread, reused across info jobs
+        if not hasattr(self.local, 'session'):
+            self.local.session = Info.create_session()
+        return self.local.session
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.check_cancelled()
+            job.result = getattr(self, f'_run_{job.type}')(job)
+            job.check_cancelled()
+            job.status = 'finished' if job.result is not None else 'failed'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'cancelled' if job.cancel_event.is_set() else 'failed'
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+
+    def _run_video(self, job):
+        options = job.options
+        summary = Video.download_url(
+            job.url,
+            start_time=options.get('start_time', ''),
+            skip_seconds=int(options.get('skip_seconds', 0)),
+            max_workers=int(options.get('workers', 1)),
+            hooks=[job.progress_hook],
+            interactive=False,
+            trim_mode=options.get('trim_mode', 'fast'),
+            cancelled=job.cancel_event.is_set,
+        )
+        if summary and summary['failed']:
+            job.error = f"{len(summary['failed'])} of {summary['total']} items failed"
+        return summary
+
+    def _run_audio(self, job):
+        options = job.options
+        ok = Audio.process_url(
+            job.url,
+            int(options.get('start_seconds', 0)),
+            int(options.get('end_skip_seconds', 0)),
+            archive=self.archive,
+            quiet=True,
+            hooks=[job.progress_hook],
+        )
+        return {'success': True} if ok else None
+
+    def _run_info(self, job):
+        options = job.options
+        output_format = options.get('format', 'pdf')
+        if output_format not in Info.REPORT_WRITERS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        filepaths = Info.build_report(
+            job.url,
+            expand=bool(options.get('expand', False)),
+            full_refresh=bool(options.get('full_refresh', False)),
+            output_format=output_format,
+            session=self._session(),
+        )
+        return None if filepaths is None else {'files': filepaths}
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'YouTubeDownloader/1.0'
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _host_allowed(self):
+        """Reject Host headers other than the daemon's own, which blocks DNS rebinding."""
+        host = (self.headers.get('Host') or '').strip().lower()
+        if host.startswith('['):
+            host = host[1:host.find(']')]
+        elif host.count(':') == 1:
+            host = host.split(':')[0]
+        return host in self.server.allowed_hosts
+
+    def _job_id(self):
+        parts = self.path.rstrip('/').split('/')
+        if len(parts) == 3 and parts[1] == 'jobs':
+            return parts[2]
+        return None
+
+    def do_GET(self):
+        if not self._host_allowed():
+            return self._send(403, {'error': 'Host not allowed'})
+        if self.path.rstrip('/') == '/jobs':
+            return self._send(200, [job.to_dict() for job in self.manager.list()])
+        job = self.manager.get(self._job_id())
+        if job is None:
+            return self._send(404, {'error': 'Job not found'})
+        self._send(200, job.to_dict())
+
+    def do_POST(self):
+        if not self._host_allowed():
+            return self._send(403, {'error': 'Host not allowed'})
+        if self.path.rstrip('/') != '/jobs':
+            return self._send(404, {'error': 'Not found'})
+        # Browsers send cross-origin text/plain or form posts without a preflight
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            return self._send(415, {'error': 'Content-Type must be application/json'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job = self.manager.submit(request.get('type'), (request.get('url') or '').strip(),
+                                      request.get('options'))
+        except (ValueError, AttributeError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(202, job.to_dict())
+
+    def do_DELETE(self):
+        if not self._host_allowed():
+            return self._send(403, {'error': 'Host not allowed'})
+        job = self.manager.cancel(self._job_id())
+        if job is None:
+            return self._send(404, {'error': 'Job not found'})
+        self._send(200, job.to_dict())
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {self.command} {self.path} {format % args}\n")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the downloader as a daemon with a local job API")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=2, help="number of jobs run at once (default: 2)")
+    args = parser.parse_args()
+
+    manager = JobManager(workers=max(1, args.workers))
+    if args.socket:
+        server = UnixHTTPServer(args.socket, JobRequestHandler)
+        where = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+        where = f"http://{args.host}:{args.port}"
+    server.manager = manager
+    server.allowed_hosts = {*LOCAL_HOSTS, args.host.lower()}
+
+    print(f"Listening on {where}")
+    # No bars in a daemon, but keep exporting metrics if YTDL_METRICS_FILE is set
+    get_bus().start(render=False)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down, waiting for running jobs...")
+    finally:
+        server.server_close()
+        manager.shutdown()
+        get_bus().close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
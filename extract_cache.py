@@ -0,0 +1,66 @@
+import os
+import re
+import threading
+
+from json_cache import TTLJsonCache
+from lazy_imports import lazy_import
+
+yt_dlp_utils = lazy_import('yt_dlp.utils')
+
+CACHE_DIR = os.path.expanduser('~/.cache/youtube-downloader/info')
+# Stream URLs in an info dict expire after a few hours, keep well below that.
+# YTDL_INFO_CACHE_TTL=0 keeps the cache in memory only, for the run.
+DEFAULT_TTL = int(os.environ.get('YTDL_INFO_CACHE_TTL', 30 * 60))
+# Errors that mean the cached stream URLs expired, not that the video is gone
+EXPIRED_URL_ERROR = re.compile(r'HTTP Error (403|410)')
+
+
+def is_expired_url_error(error):
+    return isinstance(error, yt_dlp_utils.DownloadError) and bool(EXPIRED_URL_ERROR.search(str(error)))
+
+
+class ExtractionCache(TTLJsonCache):
+    """Share one extraction between the info and download phases.
+
+    Info dicts are cached per URL, so a rerun against the same URL within the
+    TTL skips the page fetch, and a long-running process (the daemon, the
+    clipboard watcher) stops reusing them once their stream URLs may expire.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL):
+        super().__init__(cache_dir, ttl)
+
+    def extract(self, ydl, url):
+        """Return the info dict for `url`, extracting with `ydl` only on a cache miss."""
+        info = self.get(url)
+        if info is None:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            self.put(url, info)
+        return info
+
+    def download(self, ydl, url):
+        """Download `url` from the cached info dict instead of extracting it again.
+
+        A cached dict can carry expired stream URLs, so a download from cache
+        that fails with HTTP 403 or 410 is retried once with a fresh extraction.
+        """
+        cached = self.get(url) is not None
+        try:
+            return ydl.process_ie_result(self.extract(ydl, url), download=True)
+        except Exception as e:
+            if not cached or not is_expired_url_error(e):
+                raise
+            self.invalidate(url)
+            return ydl.process_ie_result(self.extract(ydl, url), download=True)
+
+
+_default_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
@@ -0,0 +1,168 @@
+"""Opt-in per-stage timing and profiling for the download pipelines.
+
+YTDL_INSTRUMENT=1 records, for every stage of a job, the wall time, CPU time
+(this thread plus finished child processes such as ffmpeg) and bytes written,
+prints a report when the job ends and keeps the jobs for a batch summary.
+YTDL_PROFILE=DIR additionally runs each job under cProfile and writes
+DIR/<job>.prof (view with `python -m pstats`). Both are off by default and
+the stage() calls then cost a dictionary lookup.
+
+Child CPU time comes from RUSAGE_CHILDREN, which is per process: with
+parallel batch workers an ffmpeg run can be counted in a neighbour's stage.
+"""
+import contextlib
+import cProfile
+import hashlib
+import os
+import pstats
+import threading
+import time
+
+from metrics import format_bytes, get_bus
+
+try:
+    import resource
+except ImportError:  # Not on POSIX, child CPU time is not available
+    resource = None
+
+ENABLED = os.environ.get('YTDL_INSTRUMENT') == '1'
+PROFILE_DIR = os.environ.get('YTDL_PROFILE')
+
+_local = threading.local()
+_jobs_lock = threading.Lock()
+_finished_jobs = []
+# Only one cProfile profiler can be active at a time
+_profile_lock = threading.Lock()
+
+
+def _child_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.outputs = []
+        self.wall = self.cpu = 0.0
+        self.bytes_written = 0
+        self.failed = False
+
+    def add_output(self, path):
+        """Count the size of `path` as written by this stage, measured when the stage ends."""
+        self.outputs.append(path)
+
+
+class _NullStage:
+    def add_output(self, path):
+        pass
+
+
+_null_stage = _NullStage()
+
+
+class JobTimer:
+    def __init__(self, label):
+        self.label = label
+        self.stages = []
+        self.started = time.perf_counter()
+        self.wall = None
+        self.profile_path = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stage = Stage(name)
+        wall, cpu, child_cpu = time.perf_counter(), time.thread_time(), _child_cpu()
+        try:
+            yield stage
+        except BaseException:
+            stage.failed = True
+            raise
+        finally:
+            stage.wall = time.perf_counter() - wall
+            stage.cpu = time.thread_time() - cpu + _child_cpu() - child_cpu
+            for path in stage.outputs:
+                with contextlib.suppress(OSError):
+                    stage.bytes_written += os.path.getsize(path)
+            self.stages.append(stage)
+            get_bus().record_stage(f'job:{name}', stage.wall)
+
+    def report(self):
+        lines = [f"Timing for {self.label} ({self.wall:.2f}s total)",
+                 f"  {'stage':<12} {'wall':>8} {'cpu':>8} {'share':>6} {'written':>11}"]
+        for stage in self.stages:
+            share = stage.wall / self.wall * 100 if self.wall else 0
+            lines.append(f"  {stage.name:<12} {stage.wall:>7.2f}s {stage.cpu:>7.2f}s {share:>5.1f}% "
+                         f"{format_bytes(stage.bytes_written):>11}{'  FAILED' if stage.failed else ''}")
+        if self.profile_path:
+            lines.append(f"  profile: {self.profile_path}")
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def job(label):
+    """Instrument one job run in the current thread; a no-op unless YTDL_INSTRUMENT=1."""
+    if not ENABLED:
+        yield None
+        return
+    timer = JobTimer(label)
+    _local.timer = timer
+    profiler = None
+    if PROFILE_DIR and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield timer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = hashlib.sha1(label.encode('utf-8')).hexdigest()[:12]
+            timer.profile_path = os.path.join(PROFILE_DIR, f'{name}.prof')
+            profiler.dump_stats(timer.profile_path)
+        timer.wall = time.perf_counter() - timer.started
+        _local.timer = None
+        with _jobs_lock:
+            _finished_jobs.append(timer)
+        print(timer.report())
+
+
+def stage(name):
+    """Time a block as stage `name` of the current thread's job, if one is instrumented."""
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        return contextlib.nullcontext(_null_stage)
+    return timer.stage(name)
+
+
+def batch_summary():
+    """Aggregate of every job instrumented so far, or '' when instrumentation is off."""
+    with _jobs_lock:
+        jobs = list(_finished_jobs)
+    if not jobs:
+        return ''
+    totals = {}
+    for timer in jobs:
+        for stage in timer.stages:
+            total = totals.setdefault(stage.name, {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes': 0, 'failed': 0})
+            total['count'] += 1
+            total['wall'] += stage.wall
+            total['cpu'] += stage.cpu
+            total['bytes'] += stage.bytes_written
+            total['failed'] += stage.failed
+    job_wall = sum(timer.wall for timer in jobs)
+    lines = [f"Batch timing: {len(jobs)} jobs, {job_wall:.2f}s of job time",
+             f"  {'stage':<12} {'runs':>5} {'wall':>9} {'mean':>8} {'cpu':>9} {'share':>6} {'written':>11} {'failed':>6}"]
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall']):
+        share = total['wall'] / job_wall * 100 if job_wall else 0
+        lines.append(f"  {name:<12} {total['count']:>5} {total['wall']:>8.2f}s {total['wall'] / total['count']:>7.2f}s "
+                     f"{total['cpu']:>8.2f}s {share:>5.1f}% {format_bytes(total['bytes']):>11} {total['failed']:>6}")
+    profiles = [timer.profile_path for timer in jobs if timer.profile_path]
+    if profiles:
+        combined = os.path.join(PROFILE_DIR, 'batch.prof')
+        pstats.Stats(*profiles).dump_stats(combined)
+        lines.append(f"  combined profile: {combined}")
+    return '\n'.join(lines)
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class TTLJsonCache:
+    """JSON values cached per key in memory and, when a TTL is set, on disk.
+
+    Each key is one file under `cache_dir`, written atomically, so reruns
+    within the TTL find it again. Entries older than the TTL are ignored in
+    memory too, since long-running processes would otherwise keep them
+    forever; expired files are removed the first time the cache writes. A TTL
+    of 0 keeps values in memory only, for the life of the process.
+    """
+
+    def __init__(self, cache_dir, ttl):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory = {}
+        self.pruned = False
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _expired(self, stored):
+        return bool(self.ttl) and time.time() - stored > self.ttl
+
+    def get(self, key):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self.memory[key]
+                entry = None
+        if entry is not None or not self.ttl:
+            return entry[1] if entry else None
+        path = self._path(key)
+        try:
+            stored = os.path.getmtime(path)
+            if self._expired(stored):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            self.memory[key] = (stored, value)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.memory[key] = (time.time(), value)
+            prune, self.pruned = not self.pruned, True
+        if not self.ttl:
+            return
+        if prune:
+            self.prune()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = self._path(key) + f'.{threading.get_ident()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(temp_path, self._path(key))
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def invalidate(self, key):
+        with self.lock:
+            self.memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Remove cache files older than the TTL."""
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.name.endswith('.json') and self._expired(entry.stat().st_mtime):
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
@@ -0,0 +1,94 @@
+import functools
+import importlib
+import sys
+import threading
+
+_import_lock = threading.RLock()
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    `yt_dlp = lazy_import('yt_dlp')` costs nothing at startup; the real import
+    happens the first time a path actually touches `yt_dlp.<something>`.
+    """
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _import_lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class LazyAttribute:
+    """Stand-in for `from module import name`, resolved on first call or attribute access."""
+
+    def __init__(self, module_name, attr):
+        self._module = lazy_import(module_name)
+        self._attr = attr
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = getattr(self._module, self._attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f"<lazy {self._module._name}.{self._attr}>"
+
+
+def lazy_import(name):
+    """Return the module if it is already imported, otherwise a LazyModule proxy."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def lazy_from(module_name, attr):
+    return LazyAttribute(module_name, attr)
+
+
+def lazy_class(factory):
+    """Decorator for a function that builds a class, e.g. a subclass of a lazily imported base.
+
+    The class is built on the first call and the same class returned after that,
+    so subclassing yt-dlp's post-processors does not import yt-dlp at startup.
+    """
+    built = []
+
+    @functools.wraps(factory)
+    def get_class():
+        if not built:
+            with _import_lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    return get_class
+
+
+def is_loaded(name):
+    return name in sys.modules
@@ -0,0 +1,278 @@
+"""Progress and metrics bus shared by all downloads in the process.
+
+yt-dlp progress hooks only update counters in memory; a single background
+thread renders the terminal bars at REFRESH_INTERVAL and exports the counters
+every EXPORT_INTERVAL to YTDL_METRICS_FILE, if set: Prometheus text format
+for a '.prom' file (rewritten atomically), JSON lines snapshots otherwise.
+Bars are drawn on a terminal only, unless YTDL_PROGRESS=1 forces them.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+from bandwidth import STALE_AFTER
+
+REFRESH_INTERVAL = 0.25
+EXPORT_INTERVAL = 10
+BAR_WIDTH = 20
+LABEL_WIDTH = 28
+
+
+def format_bytes(value):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024 or unit == 'GiB':
+            return f"{value:.1f} {unit}" if unit != 'B' else f"{int(value)} B"
+        value /= 1024
+
+
+class _BarStream:
+    """stdout wrapper that clears the bars before any other output is written."""
+
+    def __init__(self, bus, stream):
+        self.bus = bus
+        self.stream = stream
+
+    def write(self, text):
+        with self.bus.render_lock:
+            self.bus.clear_bars()
+            return self.stream.write(text)
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+
+class ProgressBus:
+    def __init__(self, metrics_file=None):
+        self.metrics_file = metrics_file
+        self.lock = threading.Lock()
+        self.render_lock = threading.RLock()
+        self.items = {}
+        self.counters = {'downloaded_bytes': 0, 'started': 0, 'finished': 0, 'failed': 0}
+        self.stages = {}
+        self.failures = {}
+        self.postprocessor_started = {}
+        self.rendering = False
+        self.drawn_lines = 0
+        self.stream = sys.stdout
+        self.thread = None
+        self.users = 0
+        self.stop_event = threading.Event()
+        self.last_export = 0
+
+    # -- events ---------------------------------------------------------------
+
+    def hook(self, label=None):
+        """Return a yt-dlp progress hook; each file it downloads shows as one transfer.
+
+        Transfers are labelled `label`, or by their title when no label is given.
+        """
+        def progress_hook(d):
+            key = d.get('tmpfilename') or d.get('filename')
+            name = label or (d.get('info_dict') or {}).get('title') or os.path.basename(d.get('filename') or '')
+            status = d.get('status')
+            downloaded = d.get('downloaded_bytes') or 0
+            with self.lock:
+                item = self.items.get(key)
+                if item is None:
+                    item = self.items[key] = {'label': name, 'downloaded': 0, 'total': None,
+                                              'speed': None, 'eta': None, 'started': time.monotonic()}
+                    self.counters['started'] += 1
+                item['updated'] = time.monotonic()
+                self.counters['downloaded_bytes'] += max(0, downloaded - item['downloaded'])
+                item['downloaded'] = max(item['downloaded'], downloaded)
+                item['total'] = d.get('total_bytes') or d.get('total_bytes_estimate') or item['total']
+                item['speed'] = d.get('speed')
+                item['eta'] = d.get('eta')
+                if status == 'finished':
+                    self.counters['finished'] += 1
+                    self._record_stage('download', time.monotonic() - item['started'])
+                    del self.items[key]
+                elif status == 'error':
+                    self.counters['failed'] += 1
+                    self.failures['download'] = self.failures.get('download', 0) + 1
+                    del self.items[key]
+        return progress_hook
+
+    def postprocessor_hook(self, d):
+        """yt-dlp `postprocessor_hooks` entry timing each post-processor as its own stage."""
+        key = ('pp', d.get('postprocessor'), (d.get('info_dict') or {}).get('id'))
+        with self.lock:
+            if d.get('status') == 'started':
+                self.postprocessor_started[key] = time.monotonic()
+            elif d.get('status') == 'finished':
+                started = self.postprocessor_started.pop(key, None)
+                if started is not None:
+                    self._record_stage(f"postprocess:{d.get('postprocessor')}", time.monotonic() - started)
+
+    def _record_stage(self, stage, seconds):
+        total = self.stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+        total['count'] += 1
+        total['seconds'] += seconds
+
+    def record_stage(self, stage, seconds):
+        with self.lock:
+            self._record_stage(stage, seconds)
+
+    def record_failure(self, stage):
+        with self.lock:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block as stage `name`, counting it as a failure of that stage if it raises."""
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.record_failure(name)
+            raise
+        finally:
+            self.record_stage(name, time.monotonic() - started)
+
+    # -- snapshot and export --------------------------------------------------
+
+    def _expire_items(self, now):
+        # Downloads aborted by an exception never send an 'error' progress event
+        for key in [key for key, item in self.items.items() if now - item['updated'] > STALE_AFTER]:
+            del self.items[key]
+
+    def snapshot(self):
+        with self.lock:
+            self._expire_items(time.monotonic())
+            items = [dict(item) for item in self.items.values()]
+            return {
+                'time': time.time(),
+                'counters': dict(self.counters),
+                'active': len(items),
+                'throughput': sum(item['speed'] or 0 for item in items),
+                'stages': {name: dict(value) for name, value in self.stages.items()},
+                'failures': dict(self.failures),
+                'items': items,
+            }
+
+    def prometheus_text(self, snapshot):
+        counters = snapshot['counters']
+        lines = [
+            '# TYPE ytdl_downloaded_bytes_total counter',
+            f"ytdl_downloaded_bytes_total {counters['downloaded_bytes']}",
+            '# TYPE ytdl_transfers_total counter',
+        ]
+        lines += [f'ytdl_transfers_total{{status="{status}"}} {counters[status]}'
+                  for status in ('started', 'finished', 'failed')]
+        lines += [
+            '# TYPE ytdl_active_transfers gauge',
+            f"ytdl_active_transfers {snapshot['active']}",
+            '# TYPE ytdl_throughput_bytes_per_second gauge',
+            f"ytdl_throughput_bytes_per_second {snapshot['throughput']:.0f}",
+            '# TYPE ytdl_stage_seconds summary',
+        ]
+        for stage, value in sorted(snapshot['stages'].items()):
+            lines.append(f'ytdl_stage_seconds_sum{{stage="{stage}"}} {value["seconds"]:.3f}')
+            lines.append(f'ytdl_stage_seconds_count{{stage="{stage}"}} {value["count"]}')
+        lines.append('# TYPE ytdl_failures_total counter')
+        lines += [f'ytdl_failures_total{{stage="{stage}"}} {count}'
+                  for stage, count in sorted(snapshot['failures'].items())]
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        if not self.metrics_file:
+            return
+        snapshot = self.snapshot()
+        try:
+            directory = os.path.dirname(self.metrics_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.metrics_file.endswith('.prom'):
+                temp_path = f'{self.metrics_file}.{os.getpid()}.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.prometheus_text(snapshot))
+                os.replace(temp_path, self.metrics_file)
+            else:
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        except OSError:
+            pass
+
+    # -- rendering ------------------------------------------------------------
+
+    def start(self, render=True):
+        """Start the background refresh; bars are only drawn on a terminal.
+
+        Calls nest: the refresh stops at the close() matching the first start().
+        """
+        with self.render_lock:
+            self.users += 1
+            if render and not self.rendering and (self.stream.isatty() or os.environ.get('YTDL_PROGRESS') == '1'):
+                self.rendering = True
+                sys.stdout = _BarStream(self, self.stream)
+            if self.thread is None:
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def close(self):
+        with self.render_lock:
+            self.users = max(0, self.users - 1)
+            if self.users:
+                return
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        with self.render_lock:
+            if self.rendering:
+                self.clear_bars()
+                sys.stdout = self.stream
+                self.rendering = False
+        self.export()
+
+    def _run(self):
+        while not self.stop_event.wait(REFRESH_INTERVAL):
+            if self.rendering:
+                self.render()
+            if self.metrics_file and time.monotonic() - self.last_export >= EXPORT_INTERVAL:
+                self.last_export = time.monotonic()
+                self.export()
+
+    def clear_bars(self):
+        if self.drawn_lines:
+            self.stream.write(f"\033[{self.drawn_lines}F\033[J")
+            self.drawn_lines = 0
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+        for item in snapshot['items']:
+            label = item['label'][:LABEL_WIDTH].ljust(LABEL_WIDTH)
+            if item['total']:
+                fraction = min(1.0, item['downloaded'] / item['total'])
+                filled = int(fraction * BAR_WIDTH)
+                bar = f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] {fraction * 100:5.1f}%"
+            else:
+                bar = f"[{'?' * BAR_WIDTH}] {format_bytes(item['downloaded'])}"
+            speed = f"{format_bytes(item['speed'])}/s" if item['speed'] else '--'
+            eta = f"ETA {item['eta']}s" if item['eta'] is not None else ''
+            lines.append(f"{label} {bar} {speed:>12} {eta}")
+        if len(lines) > 1:
+            lines.append(f"{len(lines)} active, {format_bytes(snapshot['throughput'])}/s total")
+        with self.render_lock:
+            self.clear_bars()
+            if lines:
+                self.stream.write('\n'.join(lines) + '\n')
+                self.drawn_lines = len(lines)
+            self.stream.flush()
+
+
+_default_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _default_bus
+    with _bus_lock:
+        if _default_bus is None:
+            _default_bus = ProgressBus(os.environ.get('YTDL_METRICS_FILE'))
+        return _default_bus
@@ -0,0 +1,87 @@
+import json
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not on POSIX, fall back to the in-process lock only
+    fcntl = None
+
+INDEX_FILE = '.numbering.json'
+LOCK_FILE = '.numbering.lock'
+
+_thread_lock = threading.Lock()
+
+
+class _DirectoryLock:
+    """Exclusive lock on a directory's numbering index, across threads and processes.
+
+    Some Android storage mounts reject flock; the thread lock still covers the
+    workers of one process there.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.fd = None
+
+    def __enter__(self):
+        _thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            except OSError:
+                if self.fd is not None:
+                    os.close(self.fd)
+                self.fd = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        _thread_lock.release()
+
+
+def _scan_max_number(directory, prefix):
+    pattern = re.compile(re.escape(prefix) + r' (\d+)')
+    max_number = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(prefix):
+                match = pattern.match(entry.name)
+                if match:
+                    max_number = max(max_number, int(match.group(1)))
+    return max_number
+
+
+def _load_index(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def allocate_numbers(directory, prefix, count=1):
+    """Reserve `count` consecutive numbers for files named '<prefix> <n> ...' in `directory`.
+
+    The next free number per prefix is kept in a small index file, so the
+    directory is only listed once, the first time a prefix is seen. Returns
+    the first reserved number.
+    """
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, INDEX_FILE)
+    with _DirectoryLock(directory):
+        index = _load_index(index_path)
+        first = index.get(prefix)
+        if not isinstance(first, int):
+            first = _scan_max_number(directory, prefix) + 1
+        index[prefix] = first + max(1, count)
+        temp_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(temp_path, index_path)
+    return first
@@ -0,0 +1,139 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+COOKIES_FILE = '/storage/emulated/0/YouTube/Cookies/cookies.txt'
+INSTAGRAM_COOKIES_FILE = '/storage/emulated/0/YouTube/Cookies/instagram_cookies.txt'
+DESKTOP_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36')
+MOBILE_USER_AGENT = ('Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 '
+                     '(KHTML, like Gecko) Chrome/118.0.5993.169 Mobile Safari/537.36')
+# Separate video and audio streams merged, capped at 1080p (formats without a height pass)
+CAPPED_FORMAT = 'bestvideo[height<=?1080]+bestaudio/best[height<=?1080]'
+
+_cookie_lock = threading.Lock()
+_cookie_local = threading.local()
+_cookie_dir = None
+
+
+def thread_cookiefile(path):
+    """This thread's private copy of the cookie file at `path`.
+
+    yt-dlp rewrites its cookie file in place when an instance closes, so
+    parallel workers sharing one file could truncate it while another loads
+    it. Each thread works on its own copy, taken once from the untouched
+    original; cookies a site updates are kept for that thread's next items.
+    """
+    global _cookie_dir
+    copies = _cookie_local.__dict__.setdefault('copies', {})
+    if path not in copies:
+        with _cookie_lock:
+            if _cookie_dir is None:
+                _cookie_dir = tempfile.mkdtemp(prefix='ytdl_cookies_')
+                atexit.register(shutil.rmtree, _cookie_dir, True)
+            copy_path = os.path.join(_cookie_dir, f'{threading.get_ident()}_{len(copies)}.txt')
+            shutil.copyfile(path, copy_path)
+        copies[path] = copy_path
+    return copies[path]
+
+
+class PlatformProfile:
+    """Everything the scripts need to know about one platform.
+
+    `concurrency` is the default number of items downloaded at once for the
+    platform; `extra` holds platform-specific yt-dlp params.
+    """
+
+    def __init__(self, name, hosts, video_format='best', audio_format='bestaudio/best',
+                 user_agent=DESKTOP_USER_AGENT, referer=None, cookiefile=COOKIES_FILE,
+                 concurrency=2, extra=None):
+        self.name = name
+        self.hosts = hosts
+        self.video_format = video_format
+        self.audio_format = audio_format
+        self.user_agent = user_agent
+        self.referer = referer
+        self.cookiefile = cookiefile
+        self.concurrency = concurrency
+        self.extra = extra or {}
+        self._params = None
+
+    @property
+    def headers(self):
+        headers = {'User-Agent': self.user_agent}
+        if self.referer:
+            headers['Referer'] = self.referer
+        return headers
+
+    def ydl_params(self, cookies=True):
+        """yt-dlp params (headers, cookies, extras); copy before adding per-item keys.
+
+        When `cookies` is set and the profile's cookie file exists, the calling
+        thread's private copy of it is passed (see thread_cookiefile).
+        """
+        if self._params is None:
+            params = {'http_headers': self.headers}
+            params.update(self.extra)
+            self._params = params
+        if cookies and self.cookiefile and os.path.exists(self.cookiefile):
+            return dict(self._params, cookiefile=thread_cookiefile(self.cookiefile))
+        return self._params
+
+    def __repr__(self):
+        return f"PlatformProfile({self.name!r})"
+
+
+def _build_registry():
+    profiles = [
+        PlatformProfile(
+            'YouTube', ['youtube.com', 'youtu.be', 'youtube-nocookie.com'],
+            video_format='bestvideo[height<=1080][vcodec^=avc1]+bestaudio/best[height<=720]/best',
+            concurrency=3),
+        PlatformProfile(
+            'Facebook', ['facebook.com', 'fb.watch', 'fb.com'],
+            referer='https://www.facebook.com/',
+            extra={'merge_output_format': 'mp4'}),
+        PlatformProfile(
+            'Instagram', ['instagram.com'],
+            user_agent=MOBILE_USER_AGENT, referer='https://www.instagram.com/',
+            cookiefile=INSTAGRAM_COOKIES_FILE),
+        PlatformProfile('TikTok', ['tiktok.com'], referer='https://www.tiktok.com/'),
+        PlatformProfile('Twitter', ['twitter.com', 'x.com'], video_format=CAPPED_FORMAT),
+        PlatformProfile('Vimeo', ['vimeo.com'], video_format=CAPPED_FORMAT),
+        PlatformProfile('Dailymotion', ['dailymotion.com'], video_format=CAPPED_FORMAT),
+    ]
+    return {host: profile for profile in profiles for host in profile.hosts}
+
+
+_registry = None
+OTHER = PlatformProfile('Other', [])
+
+
+def get_profile(url):
+    """Map a URL to its platform profile by its host name (www./m. subdomains included)."""
+    global _registry
+    if _registry is None:
+        _registry = _build_registry()
+    url = (url or '').strip()
+    try:
+        host = urlsplit(url if '://' in url else 'https://' + url).hostname or ''
+    except ValueError:
+        return OTHER
+    # Try the host and each parent domain: m.youtube.com -> youtube.com -> com
+    labels = host.split('.')
+    for i in range(len(labels) - 1):
+        profile = _registry.get('.'.join(labels[i:]))
+        if profile:
+            return profile
+    return OTHER
+
+
+def detect_platform(url):
+    return get_profile(url).name
+
+
+def is_supported(url):
+    return get_profile(url) is not OTHER
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+from json_cache import TTLJsonCache
+from lazy_imports import lazy_class, lazy_import
+
+yt_dlp_postprocessor = lazy_import('yt_dlp.postprocessor')
+
+CACHE_DIR = os.path.expanduser('~/.cache/youtube-downloader/sponsorblock')
+# Segments keep being submitted and voted on, so refresh them once a day.
+# YTDL_SPONSORBLOCK_CACHE_TTL=0 keeps the cache in memory only.
+DEFAULT_TTL = int(os.environ.get('YTDL_SPONSORBLOCK_CACHE_TTL', 24 * 60 * 60))
+REMOVE_CATEGORIES = ['sponsor', 'selfpromo', 'interaction', 'intro', 'outro', 'preview']
+
+
+class SegmentCache(TTLJsonCache):
+    """SponsorBlock answers cached per hash prefix.
+
+    The API is queried with the first four hex characters of the video ID's
+    sha256 and answers for every video sharing that prefix, so one response
+    serves all of them: in memory for the run and on disk for reruns.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL):
+        super().__init__(cache_dir, ttl)
+        self.fetch_locks = {}
+
+    def fetch_lock(self, key):
+        """Lock held while `key` is fetched, so parallel workers ask the API only once."""
+        with self.lock:
+            return self.fetch_locks.setdefault(key, threading.Lock())
+
+
+_default_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache():
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = SegmentCache()
+        return _default_cache
+
+
+@lazy_class
+def cached_sponsorblock_class():
+    """SponsorBlockPP that answers from the segment cache before asking the API."""
+    class CachedSponsorBlockPP(yt_dlp_postprocessor.SponsorBlockPP):
+        def _get_sponsor_segments(self, video_id, service):
+            prefix = hashlib.sha256(video_id.encode('ascii')).hexdigest()[:4]
+            categories = json.dumps(list(self._categories))
+            key = f'{service}:{prefix}:{categories}'
+            cache = get_segment_cache()
+            with cache.fetch_lock(key):
+                videos = cache.get(key)
+                if videos is None:
+                    url = f'{self._API_URL}/api/skipSegments/{prefix}?' + urllib.parse.urlencode({
+                        'service': service,
+                        'categories': categories,
+                        'actionTypes': json.dumps(['skip', 'poi', 'chapter']),
+                    })
+                    videos = {d['videoID']: d['segments'] for d in self._download_json(url) or []}
+                    cache.put(key, videos)
+            return videos.get(video_id, [])
+
+    return CachedSponsorBlockPP
+
+
+def sponsorblock_pp(downloader, categories=REMOVE_CATEGORIES):
+    """SponsorBlock post-processor for `downloader`; run it at the 'after_filter' stage."""
+    return cached_sponsorblock_class()(downloader, categories=categories)
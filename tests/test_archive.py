@@ -0,0 +1,49 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import DownloadArchive, archive_id, archive_variant  # noqa: E402
+
+
+class DownloadArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = DownloadArchive(os.path.join(self.directory, 'archive.jsonl'))
+        self.path = os.path.join(self.directory, 'item.mp4')
+        with open(self.path, 'wb') as f:
+            f.write(b'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_video_and_audio_do_not_collide(self):
+        self.archive.record('youtube', 'dQw4w9WgXcQ', self.path, archive_variant('video'))
+        self.assertEqual(self.archive.lookup('youtube', 'dQw4w9WgXcQ', archive_variant('video')), self.path)
+        self.assertIsNone(self.archive.lookup('youtube', 'dQw4w9WgXcQ', archive_variant('audio')))
+
+    def test_trimmed_clip_does_not_match_full_download(self):
+        self.archive.record('youtube', 'dQw4w9WgXcQ', self.path, archive_variant('video', 30, 0, 'fast'))
+        self.assertIsNone(self.archive.lookup('youtube', 'dQw4w9WgXcQ', archive_variant('video')))
+
+    def test_generic_ids_include_the_host(self):
+        first = archive_id('Generic', 'video', 'https://one.example/media/video.mp4')
+        second = archive_id('Generic', 'video', 'https://two.example/video.mp4')
+        self.assertNotEqual(first, second)
+        self.archive.record('Generic', first, self.path, 'video')
+        self.assertIsNone(self.archive.lookup('Generic', second, 'video'))
+
+    def test_other_extractor_ids_are_kept(self):
+        self.assertEqual(archive_id('Vimeo', '12345', 'https://vimeo.com/12345'), '12345')
+
+    def test_survives_reload(self):
+        self.archive.record('youtube', 'dQw4w9WgXcQ', self.path, 'audio')
+        reloaded = DownloadArchive(self.archive.path)
+        self.assertEqual(reloaded.lookup('youtube', 'dQw4w9WgXcQ', 'audio'), self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Automatic_Video import DownloadEngine, classify_failure  # noqa: E402
+
+
+class FakeYoutubeDL:
+    """Stands in for yt-dlp's sorter: ranks by height, worst first."""
+
+    def sort_formats(self, info):
+        info['formats'].sort(key=lambda f: f.get('height') or 0)
+
+
+class ClassifyFailureTest(unittest.TestCase):
+    def test_kinds(self):
+        cases = {
+            'ERROR: [youtube] abc: Requested format is not available': 'format',
+            'ERROR: unable to download video data: HTTP Error 403: Forbidden': 'forbidden',
+            'ERROR: Postprocessing: Conversion failed!': 'merge',
+            'ERROR: Unable to download webpage: The read operation timed out': 'network',
+            'ERROR: unable to download video data: HTTP Error 503: Service Unavailable': 'network',
+            'ERROR: Video unavailable': 'other',
+        }
+        for message, kind in cases.items():
+            self.assertEqual(classify_failure(message), kind, message)
+
+    def test_missing_ffmpeg_is_not_retried_as_merge(self):
+        message = 'ERROR: Postprocessing: ffprobe and ffmpeg not found. Please install or provide the path'
+        self.assertEqual(classify_failure(message), 'other')
+
+
+class NextFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = DownloadEngine()
+        self.ydl = FakeYoutubeDL()
+        # Extractor order, not sorted
+        self.info = {'formats': [
+            {'format_id': '720', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a'},
+            {'format_id': '1080v', 'height': 1080, 'vcodec': 'avc1', 'acodec': 'none'},
+            {'format_id': '360', 'height': 360, 'vcodec': 'avc1', 'acodec': 'mp4a'},
+            {'format_id': 'audio', 'vcodec': 'none', 'acodec': 'opus'},
+        ]}
+
+    def test_prefers_best_combined_format(self):
+        self.assertEqual(self.engine.next_format(self.info, set(), self.ydl), '720')
+
+    def test_skips_tried_formats(self):
+        self.assertEqual(self.engine.next_format(self.info, {'720'}, self.ydl), '360')
+
+    def test_falls_back_to_video_only_with_audio(self):
+        self.assertEqual(self.engine.next_format(self.info, {'720', '360'}, self.ydl), '1080v+bestaudio')
+
+    def test_nothing_left(self):
+        self.assertIsNone(self.engine.next_format(self.info, {'720', '360', '1080v'}, self.ydl))
+
+    def test_does_not_reorder_the_extracted_list(self):
+        self.engine.next_format(self.info, set(), self.ydl)
+        self.assertEqual([f['format_id'] for f in self.info['formats']], ['720', '1080v', '360', 'audio'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bandwidth import BandwidthScheduler, parse_rate  # noqa: E402
+
+
+class ParseRateTest(unittest.TestCase):
+    def test_empty_is_unlimited(self):
+        for text in (None, '', '   ', '0'):
+            self.assertIsNone(parse_rate(text))
+
+    def test_suffixes(self):
+        self.assertEqual(parse_rate('1.5M'), 1572864)
+        self.assertEqual(parse_rate('512KiB'), 524288)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_rate('fast')
+
+
+class SchedulerEnvironmentTest(unittest.TestCase):
+    def test_unset_limit_uses_default_cap(self):
+        with mock.patch.dict(os.environ, clear=True):
+            scheduler = BandwidthScheduler.from_environment()
+        self.assertEqual(scheduler.limit, 20 * 1024 * 1024)
+        self.assertEqual(scheduler.fragment_concurrency(), 10)
+
+    def test_empty_limit_is_unlimited(self):
+        with mock.patch.dict(os.environ, {'YTDL_BANDWIDTH_LIMIT': ''}, clear=True):
+            scheduler = BandwidthScheduler.from_environment()
+        self.assertIsNone(scheduler.limit)
+        self.assertIsNone(scheduler.current_limit())
+
+
+if __name__ == '__main__':
+    unittest.main()
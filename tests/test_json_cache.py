@@ -0,0 +1,55 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_cache import TTLJsonCache  # noqa: E402
+
+
+class TTLJsonCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip_through_disk(self):
+        TTLJsonCache(self.directory, ttl=60).put('key', {'value': 1})
+        self.assertEqual(TTLJsonCache(self.directory, ttl=60).get('key'), {'value': 1})
+
+    def test_memory_entries_expire(self):
+        cache = TTLJsonCache(self.directory, ttl=60)
+        cache.put('key', {'value': 1})
+        stored, value = cache.memory['key']
+        cache.memory['key'] = (stored - 120, value)
+        os.utime(cache._path('key'), (time.time() - 120,) * 2)
+        self.assertIsNone(cache.get('key'))
+
+    def test_zero_ttl_stays_in_memory(self):
+        cache = TTLJsonCache(self.directory, ttl=0)
+        cache.put('key', [1, 2])
+        self.assertEqual(cache.get('key'), [1, 2])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_invalidate(self):
+        cache = TTLJsonCache(self.directory, ttl=60)
+        cache.put('key', 1)
+        cache.invalidate('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_expired_files_are_pruned_on_first_write(self):
+        stale = TTLJsonCache(self.directory, ttl=60)
+        stale.put('old', 1)
+        os.utime(stale._path('old'), (time.time() - 120,) * 2)
+        cache = TTLJsonCache(self.directory, ttl=60)
+        cache.put('new', 2)
+        self.assertFalse(os.path.exists(cache._path('old')))
+        self.assertTrue(os.path.exists(cache._path('new')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numbering import allocate_numbers  # noqa: E402
+
+
+class AllocateNumbersTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_continues_after_existing_files(self):
+        for name in ('Social Media download 3 a.mp4', 'Social Media download 7 b.mp4', 'other 99.mp4'):
+            open(os.path.join(self.directory, name), 'w').close()
+        self.assertEqual(allocate_numbers(self.directory, 'Social Media download'), 8)
+
+    def test_reserves_ranges(self):
+        self.assertEqual(allocate_numbers(self.directory, 'Audio', 3), 1)
+        self.assertEqual(allocate_numbers(self.directory, 'Audio'), 4)
+
+    def test_parallel_allocations_do_not_overlap(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            numbers = list(executor.map(lambda _: allocate_numbers(self.directory, 'Item'), range(40)))
+        self.assertEqual(sorted(numbers), list(range(1, 41)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from platforms import OTHER, detect_platform, get_profile, is_supported  # noqa: E402
+
+
+class GetProfileTest(unittest.TestCase):
+    def test_hosts(self):
+        cases = {
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ': 'YouTube',
+            'https://m.youtube.com/watch?v=dQw4w9WgXcQ': 'YouTube',
+            'https://youtu.be/dQw4w9WgXcQ': 'YouTube',
+            'youtube.com/shorts/dQw4w9WgXcQ': 'YouTube',
+            'https://web.facebook.com/watch/?v=1': 'Facebook',
+            'https://fb.watch/abc/': 'Facebook',
+            'https://www.instagram.com/reel/abc/': 'Instagram',
+            'https://x.com/user/status/1': 'Twitter',
+            'HTTPS://VIMEO.COM/12345': 'Vimeo',
+        }
+        for url, name in cases.items():
+            self.assertEqual(detect_platform(url), name, url)
+
+    def test_platform_named_outside_the_host_is_not_matched(self):
+        for url in ('https://evil.com/?u=youtube.com', 'https://evil.com/youtube.com/watch',
+                    'https://youtube.com.evil.com/watch', 'https://notyoutube.com/watch'):
+            self.assertIs(get_profile(url), OTHER, url)
+            self.assertFalse(is_supported(url), url)
+
+    def test_unparseable_urls(self):
+        for url in ('', None, 'http://[invalid', 'not a url'):
+            self.assertIs(get_profile(url), OTHER, url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Video import plan_mp4_postprocessing  # noqa: E402
+
+
+class PlanMP4PostprocessingTest(unittest.TestCase):
+    def plan(self, **info):
+        return plan_mp4_postprocessing(info)[0]
+
+    def test_mp4_is_kept(self):
+        self.assertEqual(self.plan(filepath='/x/a.mp4', vcodec='vp9', acodec='opus'), 'keep')
+
+    def test_compatible_codecs_are_remuxed(self):
+        self.assertEqual(self.plan(filepath='/x/a.mkv', vcodec='avc1.640028', acodec='mp4a.40.2'), 'remux')
+        self.assertEqual(self.plan(ext='webm', vcodec='vp9', acodec='opus'), 'remux')
+        self.assertEqual(self.plan(ext='webm', vcodec='none', acodec='opus'), 'remux')
+
+    def test_incompatible_or_unknown_codecs_are_transcoded(self):
+        self.assertEqual(self.plan(ext='flv', vcodec='flv1', acodec='mp3'), 'transcode')
+        self.assertEqual(self.plan(ext='mkv', vcodec='avc1', acodec='vorbis'), 'transcode')
+        self.assertEqual(self.plan(ext='mkv'), 'transcode')
+
+
+if __name__ == '__main__':
+    unittest.main()